@@ -1,16 +1,21 @@
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, Response, status
 from fastapi.security import OAuth2PasswordBearer
 from app.db.database import GetSession
 from app.core.config import settings
 from app.core.security import decode_token
+from app.core.http_cache import catalog_etag, etag_matches
+from app.core.cache import principal_cache
 from app.models.core import User
+from app.models.user import UserResponse
 from typing import Annotated
+from uuid import UUID
 
 reusable_oauth2 = OAuth2PasswordBearer(
     tokenUrl=f"{settings.API_V1_PREFIX}/auth/login"
 )
 
-async def get_current_user(db: GetSession, token: str = Depends(reusable_oauth2)) -> User:
+async def get_current_user(db: GetSession, token: str = Depends(reusable_oauth2)) -> UserResponse:
+    """Principal of the bearer token, served from the principal cache when possible"""
     token_data = decode_token(token)
     if not token_data:
         raise HTTPException(
@@ -18,6 +23,13 @@ async def get_current_user(db: GetSession, token: str = Depends(reusable_oauth2)
             detail="Could not validate credentials",
         )
     
+    # Tokens issued before the access/refresh split carry no type
+    if token_data.get("type", "access") != "access":
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+        )
+
     user_id = token_data.get("sub")
     if not user_id:
         raise HTTPException(
@@ -25,21 +37,48 @@ async def get_current_user(db: GetSession, token: str = Depends(reusable_oauth2)
             detail="Token missing subject",
         )
     
-    user = await db.get(User, user_id)
-    if not user:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    try:
+        user_id = UUID(user_id)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+        )
+
+    cached = await principal_cache.get(str(user_id))
+    if cached is not None:
+        user = UserResponse.model_validate(cached)
+    else:
+        db_user = await db.get(User, user_id)
+        if not db_user:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+        user = UserResponse.model_validate(db_user)
+        await principal_cache.set(str(user_id), user.model_dump(mode="json"))
+
     if not user.is_active:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Inactive user")
     
     return user
 
-async def get_current_active_admin(db: GetSession, current_user: User = Depends(get_current_user)) -> User:
+async def get_current_active_admin(current_user: UserResponse = Depends(get_current_user)) -> UserResponse:
     if not current_user.is_admin:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN, detail="The user doesn't have enough privileges"
         )
     return current_user
 
+async def catalog_conditional_get(request: Request, response: Response) -> None:
+    """Answer 304 before any query runs when the client's ETag is current"""
+    etag = await catalog_etag(request)
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={settings.CATALOG_HTTP_MAX_AGE}",
+    }
+    if etag_matches(etag, request.headers.get("if-none-match")):
+        raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+
 
-GetCurrentUser = Annotated[User, Depends(get_current_user)]
-GetCurrentActiveAdmin = Annotated[User, Depends(get_current_active_admin)]
+GetCurrentUser = Annotated[UserResponse, Depends(get_current_user)]
+GetCurrentActiveAdmin = Annotated[UserResponse, Depends(get_current_active_admin)]
+CatalogConditionalGet = Depends(catalog_conditional_get)
@@ -1,7 +1,7 @@
 from fastapi import APIRouter, Depends
 from fastapi.security import OAuth2PasswordRequestForm
 from app.services.auth_service import auth_service
-from app.models.token import Token
+from app.models.token import Token, RefreshTokenRequest
 from app.models.user import UserRegister
 from app.db.database import GetSession
 
@@ -9,9 +9,19 @@ router = APIRouter()
 
 @router.post("/register", response_model=dict)
 async def register(user_in: UserRegister, db: GetSession):
-    return await auth_service.register(db, user_in)
+    return await auth_service.register(db, user_in.dict())
 
 
 @router.post("/login", response_model=Token)
 async def login(db: GetSession, form_data: OAuth2PasswordRequestForm = Depends()):
     return await auth_service.authenticate(db, form_data.username, form_data.password)
+
+
+@router.post("/refresh", response_model=Token)
+async def refresh(body: RefreshTokenRequest, db: GetSession):
+    return await auth_service.refresh(db, body.refresh_token)
+
+
+@router.post("/logout", response_model=dict)
+async def logout(body: RefreshTokenRequest):
+    return await auth_service.logout(body.refresh_token)
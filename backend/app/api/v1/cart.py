@@ -1,9 +1,10 @@
+from typing import Union
 from uuid import UUID
-from fastapi import APIRouter
+from fastapi import APIRouter, Query
 from app.services.cart_service import cart_service
 from app.db.database import GetSession
 from app.api.deps import GetCurrentUser
-from app.models.cart import CartItemCreate, CartItemUpdate, CartResponse
+from app.models.cart import CartItemCreate, CartItemUpdate, CartBatchUpdate, CartResponse, CartSummary
 
 router = APIRouter()
 
@@ -11,24 +12,51 @@ router = APIRouter()
 async def read_cart(db: GetSession, current_user: GetCurrentUser):
     return await cart_service.get_cart_for_user(db, current_user.id)
 
-@router.post("/items", response_model=dict)
-async def add_cart_item(item_in: CartItemCreate, db: GetSession, current_user: GetCurrentUser):
-    cart = await cart_service.get_or_create_cart(db, current_user.id)
-    await cart_service.add_item(db, cart.id, item_in.product_id, item_in.quantity)
+@router.get("/summary", response_model=CartSummary)
+async def read_cart_summary(db: GetSession, current_user: GetCurrentUser):
+    """Item count and total for the header badge"""
+    return await cart_service.get_summary(db, current_user.id)
+
+# Mutations answer with the fresh cart when ?return_cart=true, saving the client a GET /cart
+ReturnCart = Query(False, description="Respond with the updated cart instead of a message")
+
+@router.post("/items", response_model=Union[CartResponse, dict])
+async def add_cart_item(
+    item_in: CartItemCreate, db: GetSession, current_user: GetCurrentUser, return_cart: bool = ReturnCart
+):
+    await cart_service.add_item(db, current_user.id, item_in.product_id, item_in.quantity)
+    if return_cart:
+        return await cart_service.get_cart_for_user(db, current_user.id)
     return {"message": "Item added to cart"}
 
-@router.put("/items/{item_id}", response_model=dict)
-async def update_cart_item(item_id: UUID, item_in: CartItemUpdate, db: GetSession, current_user: GetCurrentUser):
+@router.patch("/items", response_model=CartResponse)
+async def update_cart_items(batch: CartBatchUpdate, db: GetSession, current_user: GetCurrentUser):
+    """Set several quantities at once (0 removes); answers with the updated cart"""
+    # Later entries for the same product win
+    quantities = {item.product_id: item.quantity for item in batch.items}
+    await cart_service.set_quantities(db, current_user.id, quantities)
+    return await cart_service.get_cart_for_user(db, current_user.id)
+
+@router.put("/items/{item_id}", response_model=Union[CartResponse, dict])
+async def update_cart_item(
+    item_id: UUID, item_in: CartItemUpdate, db: GetSession, current_user: GetCurrentUser,
+    return_cart: bool = ReturnCart
+):
     await cart_service.update_cart_item(db, current_user.id, item_id, item_in.quantity)
+    if return_cart:
+        return await cart_service.get_cart_for_user(db, current_user.id)
     return {"message": "Item updated"}
 
-@router.delete("/items/{item_id}", response_model=dict)
-async def remove_cart_item(item_id: UUID, db: GetSession, current_user: GetCurrentUser):
+@router.delete("/items/{item_id}", response_model=Union[CartResponse, dict])
+async def remove_cart_item(
+    item_id: UUID, db: GetSession, current_user: GetCurrentUser, return_cart: bool = ReturnCart
+):
     await cart_service.remove_cart_item(db, current_user.id, item_id)
+    if return_cart:
+        return await cart_service.get_cart_for_user(db, current_user.id)
     return {"message": "Item removed"}
 
 @router.delete("/", response_model=dict)
 async def clear_cart(db: GetSession, current_user: GetCurrentUser):
-    cart = await cart_service.get_or_create_cart(db, current_user.id)
-    await cart_service.clear_cart(db, cart.id)
+    await cart_service.clear_cart(db, current_user.id)
     return {"message": "Cart cleared"}
@@ -0,0 +1,17 @@
+from fastapi import APIRouter
+from app.api.deps import GetCurrentActiveAdmin
+from app.core.cache import catalog_cache
+from app.core.idempotency import checkout_results
+from app.core.jobs import job_queue
+from app.core.security import password_hash_pool
+
+router = APIRouter()
+
+@router.get("/", response_model=dict)
+async def read_metrics(current_admin: GetCurrentActiveAdmin):
+    return {
+        "catalog_cache": catalog_cache.stats(),
+        "password_hashing": password_hash_pool.stats(),
+        "checkout_results": checkout_results.stats(),
+        "jobs": job_queue.stats(),
+    }
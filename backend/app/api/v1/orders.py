@@ -1,10 +1,43 @@
-from fastapi import APIRouter
+from typing import List, Optional
+from uuid import UUID
+from fastapi import APIRouter, Header, Query, Response
 from app.services.order_service import order_service
 from app.db.database import GetSession
-from app.api.deps import GetCurrentUser
+from app.api.deps import GetCurrentUser, GetCurrentActiveAdmin
+from app.core.config import settings
+from app.models.order import CheckoutResponse, OrderResponse
 
 router = APIRouter()
 
-@router.post("/checkout", response_model=dict)
-async def checkout(db: GetSession, current_user: GetCurrentUser):
-    return await order_service.prepare_checkout(db, current_user)
+@router.get("/", response_model=List[OrderResponse])
+async def read_orders(
+    db: GetSession,
+    current_user: GetCurrentUser,
+    response: Response,
+    limit: int = Query(settings.DEFAULT_PAGE_SIZE, ge=1, le=settings.MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    all_users: bool = Query(False, description="Every customer's orders (admins only)"),
+):
+    """Order history, newest first; follow X-Next-Cursor for older orders"""
+    orders, next_cursor = await order_service.list_orders(db, current_user, limit, cursor, all_users)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return orders
+
+@router.post("/checkout", response_model=CheckoutResponse)
+async def checkout(
+    current_user: GetCurrentUser,
+    idempotency_key: Optional[str] = Header(None, max_length=255),
+):
+    """Retries with the same Idempotency-Key and an unchanged cart replay the first result"""
+    return await order_service.checkout(current_user, idempotency_key)
+
+@router.post("/{order_id}/confirm", response_model=dict)
+async def confirm_order(order_id: UUID, db: GetSession, current_admin: GetCurrentActiveAdmin):
+    await order_service.confirm(db, order_id)
+    return {"message": "Order confirmed"}
+
+@router.post("/{order_id}/cancel", response_model=dict)
+async def cancel_order(order_id: UUID, db: GetSession, current_user: GetCurrentUser):
+    await order_service.cancel(db, order_id, current_user)
+    return {"message": "Order cancelled"}
@@ -1,30 +1,119 @@
-from typing import List, Optional
+from typing import List, Optional, Union
 from uuid import UUID
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, Query, Request, Response
 from app.models.core import ProductType
+from app.core.config import settings
+from app.core.enums import ProductSort
 from app.services.product_service import product_service
+from app.services.import_service import import_service
+from app.services.similarity_service import similarity_service
 from app.db.database import GetSession
-from app.models.product import ProductResponse
+from app.api.deps import GetCurrentActiveAdmin, CatalogConditionalGet
+from app.core.streaming import iter_multipart_file
+from app.models.product import ProductResponse, ProductSparse, ProductFacets, ProductBatch, ImportJob, SimilarProduct
 
 router = APIRouter()
 
-@router.get("/", response_model=List[ProductResponse])
+# Full items validate against ProductResponse (tried first); ?fields= items are
+# ProductSparse, and exclude_unset keeps the fields that were not requested out.
+@router.get(
+    "/",
+    response_model=Union[List[ProductResponse], List[ProductSparse]],
+    response_model_exclude_unset=True,
+    dependencies=[CatalogConditionalGet],
+)
 async def read_products(
     db: GetSession,
-    skip: int = 0,
-    limit: int = 100,
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(settings.DEFAULT_PAGE_SIZE, ge=1, le=settings.MAX_PAGE_SIZE),
     type: Optional[ProductType] = None,
     brand: Optional[str] = None,
     search: Optional[str] = None,
     min_price: Optional[float] = None,
     max_price: Optional[float] = None,
     in_stock_only: bool = Query(False),
+    sort: Optional[ProductSort] = None,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = Query(
+        None, description="Comma-separated product fields to return, e.g. name,brand,price,image_url"
+    ),
 ):
-    return await product_service.list_products(
-        db, skip, limit, type, brand, search, min_price, max_price, in_stock_only
+    selected = product_service.parse_fields(fields)
+    page = await product_service.list_products_cached(
+        db, skip, limit, type, brand, search, min_price, max_price, in_stock_only, sort, cursor,
+        selected
     )
+    if page["next_cursor"]:
+        response.headers["X-Next-Cursor"] = page["next_cursor"]
+    return page["items"]
 
-@router.get("/{product_id}", response_model=ProductResponse)
+@router.get("/facets", response_model=ProductFacets, dependencies=[CatalogConditionalGet])
+async def read_product_facets(
+    db: GetSession,
+    type: Optional[ProductType] = None,
+    brand: Optional[str] = None,
+    search: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    in_stock_only: bool = Query(False),
+):
+    return await product_service.get_facets(
+        db, type, brand, search, min_price, max_price, in_stock_only
+    )
+
+@router.get("/batch", response_model=ProductBatch, dependencies=[CatalogConditionalGet])
+async def read_products_batch(
+    db: GetSession,
+    ids: List[UUID] = Query(..., min_length=1, max_length=settings.MAX_PAGE_SIZE),
+):
+    """Several products by id (repeat `ids`), in request order"""
+    return await product_service.get_many_cached(db, ids)
+
+@router.post(
+    "/import",
+    response_model=ImportJob,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "multipart/form-data": {
+                    "schema": {
+                        "type": "object",
+                        "properties": {"file": {"type": "string", "format": "binary"}},
+                        "required": ["file"],
+                    }
+                }
+            },
+        }
+    },
+)
+async def import_products(
+    request: Request,
+    db: GetSession,
+    current_admin: GetCurrentActiveAdmin,
+    job_id: Optional[UUID] = Query(None, description="Job from POST /import/jobs, to poll progress during the upload"),
+):
+    """Stream a supplier CSV (multipart field `file`) straight into batched upserts"""
+    return await import_service.run_upload(db, iter_multipart_file(request), job_id)
+
+@router.post("/import/jobs", response_model=ImportJob)
+async def create_import_job(current_admin: GetCurrentActiveAdmin):
+    """Reserve an import job id; pass it as ?job_id= to POST /import"""
+    return await import_service.create_job()
+
+@router.get("/import/{job_id}", response_model=ImportJob)
+async def read_import_job(job_id: UUID, current_admin: GetCurrentActiveAdmin):
+    return await import_service.get_job(job_id)
+
+@router.get("/{product_id}", response_model=ProductResponse, dependencies=[CatalogConditionalGet])
 async def read_product_by_id(product_id: UUID, db: GetSession):
-    return await product_service.get_by_id(db, product_id)
+    return await product_service.get_by_id_cached(db, product_id)
 
+@router.get("/{product_id}/similar", response_model=List[SimilarProduct], dependencies=[CatalogConditionalGet])
+async def read_similar_products(
+    product_id: UUID,
+    db: GetSession,
+    limit: int = Query(10, ge=1, le=20),
+):
+    return await similarity_service.get_similar(db, product_id, limit)
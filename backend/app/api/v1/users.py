@@ -12,11 +12,13 @@ async def read_user_me(current_user: GetCurrentUser):
 
 @router.put("/me", response_model=UserResponse)
 async def update_user_me(user_in: UserUpdate, db: GetSession, current_user: GetCurrentUser):
-    return await user_service.update(db, current_user, user_in.dict(exclude_unset=True))
+    db_user = await user_service.get_by_id(db, current_user.id)
+    return await user_service.update(db, db_user, user_in.dict(exclude_unset=True))
 
 @router.delete("/me", response_model=dict)
 async def delete_user_me(db: GetSession, current_user: GetCurrentUser):
-    await user_service.delete(db, current_user)
+    db_user = await user_service.get_by_id(db, current_user.id)
+    await user_service.delete(db, db_user)
     return {"message": "User deleted successfully"}
 
 
@@ -0,0 +1,247 @@
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Tuple
+from redis import asyncio as aioredis
+from redis.exceptions import RedisError
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_redis_client: Optional[aioredis.Redis] = None
+
+def get_redis() -> Optional[aioredis.Redis]:
+    """Shared Redis client, or None when REDIS_URL is not configured"""
+    global _redis_client
+    if _redis_client is None and settings.REDIS_URL:
+        _redis_client = aioredis.from_url(settings.REDIS_URL, decode_responses=True)
+    return _redis_client
+
+async def close_redis() -> None:
+    global _redis_client
+    if _redis_client is not None:
+        await _redis_client.aclose()
+        _redis_client = None
+
+
+class LRUCache:
+    """In-process LRU with a per-entry TTL"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class TwoTierCache:
+    """In-process LRU in front of an optional shared Redis tier.
+
+    Values must be JSON-serializable. Redis failures are logged and treated
+    as misses so the cache never takes a request down with it.
+    """
+
+    def __init__(self, namespace: str, maxsize: int = None, ttl: int = None, local_ttl: int = None):
+        self.namespace = namespace
+        self.ttl = ttl or settings.CACHE_TTL_SECONDS
+        self.local = LRUCache(maxsize or settings.CACHE_LOCAL_MAXSIZE, local_ttl or self.ttl)
+        self.local_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+
+    def _redis_key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    async def get(self, key: str) -> Optional[Any]:
+        value = self.local.get(key)
+        if value is not None:
+            self.local_hits += 1
+            return value
+
+        redis = get_redis()
+        if redis is not None:
+            try:
+                raw = await redis.get(self._redis_key(key))
+            except RedisError as e:
+                logger.warning(f"Cache read failed for {self.namespace}: {e}")
+                raw = None
+            if raw is not None:
+                value = json.loads(raw)
+                self.local.set(key, value)
+                self.redis_hits += 1
+                return value
+
+        self.misses += 1
+        return None
+
+    async def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        found: Dict[str, Any] = {}
+        remote_keys = []
+        for key in keys:
+            value = self.local.get(key)
+            if value is not None:
+                self.local_hits += 1
+                found[key] = value
+            else:
+                remote_keys.append(key)
+
+        remote_hits = 0
+        redis = get_redis()
+        if remote_keys and redis is not None:
+            try:
+                raw_values = await redis.mget([self._redis_key(k) for k in remote_keys])
+            except RedisError as e:
+                logger.warning(f"Cache read failed for {self.namespace}: {e}")
+                raw_values = [None] * len(remote_keys)
+            for key, raw in zip(remote_keys, raw_values):
+                if raw is not None:
+                    value = json.loads(raw)
+                    self.local.set(key, value)
+                    remote_hits += 1
+                    found[key] = value
+
+        self.redis_hits += remote_hits
+        self.misses += len(remote_keys) - remote_hits
+        return found
+
+    async def set(self, key: str, value: Any) -> None:
+        await self.set_many({key: value})
+
+    async def set_many(self, items: Dict[str, Any]) -> None:
+        for key, value in items.items():
+            self.local.set(key, value)
+
+        redis = get_redis()
+        if items and redis is not None:
+            try:
+                async with redis.pipeline(transaction=False) as pipe:
+                    for key, value in items.items():
+                        pipe.set(self._redis_key(key), json.dumps(value), ex=self.ttl)
+                    await pipe.execute()
+            except RedisError as e:
+                logger.warning(f"Cache write failed for {self.namespace}: {e}")
+
+    async def delete(self, key: str) -> None:
+        self.local.delete(key)
+        redis = get_redis()
+        if redis is not None:
+            try:
+                await redis.delete(self._redis_key(key))
+            except RedisError as e:
+                logger.warning(f"Cache delete failed for {self.namespace}: {e}")
+
+    def stats(self) -> dict:
+        hits = self.local_hits + self.redis_hits
+        lookups = hits + self.misses
+        return {
+            "local_hits": self.local_hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+            "local_entries": len(self.local),
+            "redis_enabled": get_redis() is not None,
+        }
+
+
+class VersionedCache(TwoTierCache):
+    """Two-tier cache whose keys are scoped by a version counter.
+
+    Bumping the version invalidates every entry at once; the counter lives
+    in Redis when available so all workers see the bump.
+    """
+
+    def __init__(self, namespace: str, maxsize: int = None, ttl: int = None):
+        super().__init__(namespace, maxsize, ttl)
+        self._version = 0
+        self._version_checked_at = 0.0
+
+    @property
+    def _version_key(self) -> str:
+        return f"{self.namespace}:version"
+
+    async def version(self) -> int:
+        redis = get_redis()
+        if redis is None:
+            return self._version
+
+        now = time.monotonic()
+        if now - self._version_checked_at >= settings.CACHE_VERSION_CHECK_SECONDS:
+            try:
+                remote = int(await redis.get(self._version_key) or 0)
+            except RedisError as e:
+                logger.warning(f"Cache version check failed for {self.namespace}: {e}")
+                return self._version
+            self._set_local_version(remote)
+            self._version_checked_at = now
+        return self._version
+
+    async def bump_version(self) -> int:
+        redis = get_redis()
+        if redis is not None:
+            try:
+                self._set_local_version(int(await redis.incr(self._version_key)))
+                self._version_checked_at = time.monotonic()
+                return self._version
+            except RedisError as e:
+                logger.warning(f"Cache version bump failed for {self.namespace}: {e}")
+        self._set_local_version(self._version + 1)
+        return self._version
+
+    def _set_local_version(self, version: int) -> None:
+        if version != self._version:
+            self._version = version
+            self.local.clear()
+
+    async def _scoped(self, key: str) -> str:
+        return f"v{await self.version()}:{key}"
+
+    async def get(self, key: str) -> Optional[Any]:
+        return await super().get(await self._scoped(key))
+
+    async def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        prefix = await self._scoped("")
+        found = await super().get_many([prefix + key for key in keys])
+        return {key[len(prefix):]: value for key, value in found.items()}
+
+    async def set_many(self, items: Dict[str, Any]) -> None:
+        prefix = await self._scoped("")
+        await super().set_many({prefix + key: value for key, value in items.items()})
+
+    async def delete(self, key: str) -> None:
+        await super().delete(await self._scoped(key))
+
+    def stats(self) -> dict:
+        return {**super().stats(), "version": self._version}
+
+
+catalog_cache = VersionedCache("catalog")
+principal_cache = TwoTierCache("principal", ttl=settings.PRINCIPAL_CACHE_TTL_SECONDS)
+cart_summary_cache = TwoTierCache("cart_summary", local_ttl=settings.CART_CACHE_LOCAL_TTL_SECONDS)
+# Progress is written by the importing worker; other workers' local copies lag at most 1 s
+import_job_cache = TwoTierCache("import_job", ttl=settings.IMPORT_JOB_TTL_SECONDS, local_ttl=1)
@@ -20,6 +20,12 @@ class Settings(BaseSettings):
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     REFRESH_TOKEN_EXPIRE_DAYS: int = 7
+    # Threads hashing passwords (default: CPU count) and callers allowed to wait for one
+    PASSWORD_HASH_WORKERS: Optional[int] = None
+    PASSWORD_HASH_MAX_QUEUE: int = 64
+    # Argon2 cost is calibrated at startup to this hash latency; 0 keeps pwdlib's defaults
+    PASSWORD_HASH_TARGET_MS: int = 250
+    PASSWORD_HASH_MAX_MEMORY_KIB: int = 131072
     
     # CORS
     CORS_ORIGINS: List[str] = ["*"]
@@ -27,6 +33,37 @@ class Settings(BaseSettings):
     # Redis
     REDIS_URL: Optional[str] = None
     
+    # Cache
+    CACHE_LOCAL_MAXSIZE: int = 2048
+    CACHE_TTL_SECONDS: int = 300
+    CACHE_VERSION_CHECK_SECONDS: float = 1.0
+    CATALOG_HTTP_MAX_AGE: int = 60
+    # Short so another worker's stale local entry expires soon after an update
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 30
+    # Per-user cart caches: other workers' local copies only expire, so keep them brief
+    CART_CACHE_LOCAL_TTL_SECONDS: int = 5
+    # Import job progress, shared through Redis so any worker can report it
+    IMPORT_JOB_TTL_SECONDS: int = 86400
+    
+    # Stock reservations
+    RESERVATION_TTL_SECONDS: int = 900
+    RESERVATION_SWEEP_INTERVAL_SECONDS: int = 30
+    RESERVATION_SWEEP_BATCH_SIZE: int = 1000
+    
+    # Checkout retries with the same Idempotency-Key and cart contents replay the stored result
+    IDEMPOTENCY_TTL_SECONDS: int = 300
+    # Upper bound on how long a duplicate waits for another worker's in-flight checkout
+    IDEMPOTENCY_LOCK_SECONDS: int = 30
+    
+    # Background jobs (Redis list when REDIS_URL is set, in-process otherwise)
+    JOB_WORKERS: int = 4
+    JOB_MAX_ATTEMPTS: int = 5
+    JOB_RETRY_BASE_SECONDS: float = 1.0
+    JOB_RETRY_MAX_SECONDS: float = 300.0
+    # Optional: every placed order is POSTed here as JSON by a background job
+    SHOP_NOTIFY_WEBHOOK_URL: Optional[str] = None
+    SHOP_NOTIFY_TIMEOUT_SECONDS: float = 10.0
+    
     # WhatsApp
     WHATSAPP_PHONE_NUMBER: str
     
@@ -5,7 +5,18 @@ class ProductType(str, Enum):
     DECANT = "decant"
     NONE = "none"
 
+class ProductSort(str, Enum):
+    NAME = "name"
+    PRICE = "price"
+    RELEVANCE = "relevance"
+
 class OrderStatus(str, Enum):
     PENDING = "pending"
     CONFIRMED = "confirmed"
-    CANCELLED = "cancelled"
\ No newline at end of file
+    CANCELLED = "cancelled"
+
+class ImportStatus(str, Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
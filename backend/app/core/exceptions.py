@@ -1,4 +1,4 @@
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional
 
 class EssenciaRabeException(Exception):
     """Base exception for EssenciaRabe project"""
@@ -52,6 +52,26 @@ class OutOfStockError(EssenciaRabeException):
             status_code=400
         )
 
+class InvalidQuantityError(EssenciaRabeException):
+    def __init__(self, quantity: int):
+        super().__init__(message=f"Quantity must be positive, got {quantity}", status_code=400)
+
 class InvalidOrderStateError(EssenciaRabeException):
     def __init__(self, message: str):
         super().__init__(message=message, status_code=400)
+
+class InvalidCursorError(EssenciaRabeException):
+    def __init__(self, message: str = "Invalid pagination cursor"):
+        super().__init__(message=message, status_code=400)
+
+class InvalidFieldSelectionError(EssenciaRabeException):
+    def __init__(self, unknown: List[str]):
+        super().__init__(message=f"Unknown fields: {', '.join(unknown)}", status_code=400)
+
+class ServiceBusyError(EssenciaRabeException):
+    def __init__(self, message: str = "Server is busy, please retry shortly", retry_after: int = 1):
+        super().__init__(
+            message=message,
+            status_code=503,
+            headers={"Retry-After": str(retry_after)}
+        )
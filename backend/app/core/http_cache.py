@@ -0,0 +1,29 @@
+import hashlib
+from typing import Optional
+from uuid import uuid4
+from fastapi import Request
+from app.core.cache import catalog_cache, get_redis
+
+# Without Redis the catalog version restarts at 0 with every process, so an
+# ETag minted before a restart could match different data afterwards.
+_PROCESS_EPOCH = uuid4().hex
+
+
+async def catalog_etag(request: Request) -> str:
+    """Strong ETag from the catalog version, path and sorted query parameters"""
+    version = await catalog_cache.version()
+    epoch = "" if get_redis() is not None else _PROCESS_EPOCH
+    params = "&".join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items()))
+    raw = f"{epoch}|{version}|{request.url.path}|{params}"
+    return f'"{hashlib.blake2b(raw.encode(), digest_size=16).hexdigest()}"'
+
+
+def etag_matches(etag: str, if_none_match: Optional[str]) -> bool:
+    """If-None-Match uses weak comparison, so W/ prefixes are ignored"""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
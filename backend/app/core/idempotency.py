@@ -0,0 +1,105 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, Tuple
+from redis.exceptions import RedisError
+from app.core.cache import TwoTierCache, get_redis
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# How often a duplicate on another worker re-checks for the stored result
+POLL_INTERVAL_SECONDS = 0.05
+
+
+class IdempotentResults:
+    """Replay stored results of side-effecting operations and coalesce duplicates.
+
+    A result is stored under its key (plus any alias keys the operation
+    reports) for IDEMPOTENCY_TTL_SECONDS. Concurrent calls with the same key
+    share one computation: within a worker they await the same task, across
+    workers a Redis SET NX marker makes the others wait for the stored
+    result. Failures are not stored, so a retry after an error runs again.
+    """
+
+    def __init__(self, namespace: str, ttl: int = None, lock_ttl: int = None):
+        self.namespace = namespace
+        self.cache = TwoTierCache(namespace, ttl=ttl or settings.IDEMPOTENCY_TTL_SECONDS)
+        self.lock_ttl = lock_ttl or settings.IDEMPOTENCY_LOCK_SECONDS
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.replays = 0
+        self.coalesced = 0
+
+    def _lock_key(self, key: str) -> str:
+        return f"{self.namespace}:lock:{key}"
+
+    async def run(self, key: str, compute: Callable[[], Awaitable[Tuple[Any, Iterable[str]]]]) -> Any:
+        """Stored result for `key`, or the result of `compute()`.
+
+        `compute` returns (result, alias_keys); the result must be
+        JSON-serializable.
+        """
+        cached = await self.cache.get(key)
+        if cached is not None:
+            self.replays += 1
+            return cached
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            task = asyncio.ensure_future(self._compute_once(key, compute))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # shield: a disconnecting duplicate must not cancel the shared computation
+        return await asyncio.shield(task)
+
+    async def _compute_once(self, key: str, compute) -> Any:
+        redis = get_redis()
+        acquired = False
+        if redis is not None:
+            try:
+                acquired = bool(await redis.set(self._lock_key(key), "1", nx=True, ex=self.lock_ttl))
+                if not acquired:
+                    result = await self._wait_for_result(key)
+                    if result is not None:
+                        self.coalesced += 1
+                        return result
+            except RedisError as e:
+                logger.warning(f"Idempotency lock failed for {self.namespace}: {e}")
+
+        try:
+            result, aliases = await compute()
+            await self.cache.set_many({alias: result for alias in (key, *aliases)})
+            return result
+        finally:
+            if acquired:
+                try:
+                    await redis.delete(self._lock_key(key))
+                except RedisError as e:
+                    logger.warning(f"Idempotency unlock failed for {self.namespace}: {e}")
+
+    async def _wait_for_result(self, key: str) -> Any:
+        """Poll for another worker's result until its marker goes away"""
+        redis = get_redis()
+        deadline = time.monotonic() + self.lock_ttl
+        while time.monotonic() < deadline:
+            await asyncio.sleep(POLL_INTERVAL_SECONDS)
+            result = await self.cache.get(key)
+            if result is not None:
+                return result
+            if not await redis.exists(self._lock_key(key)):
+                # The owner failed (or stored under a different key): run it here
+                return await self.cache.get(key)
+        return None
+
+    def stats(self) -> dict:
+        return {
+            **self.cache.stats(),
+            "replays": self.replays,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._inflight),
+        }
+
+
+checkout_results = IdempotentResults("checkout")
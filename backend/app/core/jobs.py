@@ -0,0 +1,307 @@
+import asyncio
+import json
+import logging
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from uuid import uuid4
+from redis.exceptions import RedisError
+from app.core.cache import get_redis
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+JobHandler = Callable[[Dict[str, Any]], Awaitable[None]]
+
+# How long an idle Redis worker blocks on BRPOPLPUSH before checking for shutdown
+POLL_TIMEOUT_SECONDS = 1
+# A process whose heartbeat is this old is presumed dead; its unacked jobs are requeued
+CONSUMER_TTL_SECONDS = 30
+
+
+class JobQueue:
+    """Small asyncio job queue for side effects that must not hold up a request.
+
+    Jobs are a registered handler name plus a JSON payload. With REDIS_URL
+    set they go through a Redis list shared by every worker process, and
+    retries wait in a sorted set scored by due time; otherwise an in-process
+    asyncio.Queue is used and pending jobs die with the process. Failed jobs
+    are retried with exponential backoff and jitter; after JOB_MAX_ATTEMPTS
+    they are logged and, on Redis, parked in a dead-letter list.
+
+    On Redis a taken job sits in this process's processing list until its
+    handler finishes. Shutdown puts unfinished jobs back, and the lists of
+    processes that stopped heartbeating are requeued by the others, so a
+    job can run more than once: handlers must be idempotent.
+
+    broadcast() runs a job in every process instead of one, for refreshing
+    per-process state; it goes through Redis pub/sub and is best effort.
+    """
+
+    def __init__(self, namespace: str = "jobs"):
+        self.namespace = namespace
+        self.consumer = uuid4().hex
+        self.handlers: Dict[str, JobHandler] = {}
+        self._local: asyncio.Queue = asyncio.Queue()
+        self._tasks: List[asyncio.Task] = []
+        self.enqueued = 0
+        self.completed = 0
+        self.retried = 0
+        self.dead = 0
+
+    @property
+    def _ready_key(self) -> str:
+        return f"{self.namespace}:ready"
+
+    @property
+    def _delayed_key(self) -> str:
+        return f"{self.namespace}:delayed"
+
+    @property
+    def _dead_key(self) -> str:
+        return f"{self.namespace}:dead"
+
+    @property
+    def _consumers_key(self) -> str:
+        return f"{self.namespace}:consumers"
+
+    def _processing_key(self, consumer: str) -> str:
+        return f"{self.namespace}:processing:{consumer}"
+
+    def _heartbeat_key(self, consumer: str) -> str:
+        return f"{self.namespace}:heartbeat:{consumer}"
+
+    @property
+    def _broadcast_channel(self) -> str:
+        return f"{self.namespace}:broadcast"
+
+    def register(self, name: str, handler: JobHandler) -> None:
+        self.handlers[name] = handler
+
+    async def enqueue(self, name: str, payload: Optional[Dict[str, Any]] = None) -> str:
+        """Queue a job and return its id; never waits for the job itself.
+
+        The handler only has to be registered in the processes running workers.
+        """
+        job = {"id": uuid4().hex, "name": name, "payload": payload or {}, "attempt": 1}
+        await self._push(job)
+        self.enqueued += 1
+        return job["id"]
+
+    async def broadcast(self, name: str, payload: Optional[Dict[str, Any]] = None) -> str:
+        """Run a job once in every process with started workers; returns its id.
+
+        Processes that are down or disconnected miss it, so handlers must
+        cope with never being called. Without Redis it runs in this process.
+        """
+        job = {"id": uuid4().hex, "name": name, "payload": payload or {}, "attempt": 1, "broadcast": True}
+        redis = get_redis()
+        if redis is not None:
+            try:
+                await redis.publish(self._broadcast_channel, json.dumps(job))
+                self.enqueued += 1
+                return job["id"]
+            except RedisError as e:
+                logger.warning(f"Job broadcast failed, running '{name}' in this process only: {e}")
+        self._local.put_nowait(job)
+        self.enqueued += 1
+        return job["id"]
+
+    async def _push(self, job: dict, delay: float = 0) -> None:
+        redis = get_redis()
+        if redis is not None:
+            try:
+                if delay:
+                    await redis.zadd(self._delayed_key, {json.dumps(job): time.time() + delay})
+                else:
+                    await redis.lpush(self._ready_key, json.dumps(job))
+                return
+            except RedisError as e:
+                logger.warning(f"Job queue push failed, running '{job['name']}' in process: {e}")
+        if delay:
+            asyncio.get_running_loop().call_later(delay, self._local.put_nowait, job)
+        else:
+            self._local.put_nowait(job)
+
+    def _backoff(self, attempt: int) -> float:
+        delay = min(settings.JOB_RETRY_BASE_SECONDS * 2 ** (attempt - 1), settings.JOB_RETRY_MAX_SECONDS)
+        return delay * random.uniform(0.5, 1.0)
+
+    async def _run(self, job: dict) -> None:
+        handler = self.handlers.get(job["name"])
+        if handler is None:
+            logger.error(f"Dropping job {job['id']}: no handler for '{job['name']}'")
+            return
+        try:
+            await handler(job["payload"])
+            self.completed += 1
+        except Exception as e:
+            if job["attempt"] >= settings.JOB_MAX_ATTEMPTS:
+                self.dead += 1
+                logger.error(f"Job '{job['name']}' {job['id']} failed for good after {job['attempt']} attempts: {e}")
+                await self._bury(job)
+                return
+            delay = self._backoff(job["attempt"])
+            logger.warning(f"Job '{job['name']}' {job['id']} attempt {job['attempt']} failed, retrying in {delay:.1f}s: {e}")
+            self.retried += 1
+            retry = {**job, "attempt": job["attempt"] + 1}
+            if job.get("broadcast"):
+                # Each process retries its own copy
+                asyncio.get_running_loop().call_later(delay, self._local.put_nowait, retry)
+            else:
+                await self._push(retry, delay)
+
+    async def _bury(self, job: dict) -> None:
+        redis = get_redis()
+        if redis is not None:
+            try:
+                await redis.lpush(self._dead_key, json.dumps(job))
+            except RedisError as e:
+                logger.warning(f"Could not park dead job {job['id']}: {e}")
+
+    async def _next_job(self) -> Tuple[Optional[dict], Optional[str]]:
+        """Next ready job (and its raw Redis entry, to ack) or (None, None) after a short idle wait"""
+        redis = get_redis()
+        if redis is not None:
+            # Broadcast copies, local retries and jobs that fell back while Redis was down
+            if not self._local.empty():
+                return self._local.get_nowait(), None
+            try:
+                raw = await redis.brpoplpush(self._ready_key, self._processing_key(self.consumer), POLL_TIMEOUT_SECONDS)
+                if raw is not None:
+                    return json.loads(raw), raw
+            except RedisError as e:
+                logger.warning(f"Job queue read failed: {e}")
+                await asyncio.sleep(POLL_TIMEOUT_SECONDS)
+            return None, None
+        try:
+            return await asyncio.wait_for(self._local.get(), POLL_TIMEOUT_SECONDS), None
+        except asyncio.TimeoutError:
+            return None, None
+
+    async def _ack(self, raw: str) -> None:
+        try:
+            await get_redis().lrem(self._processing_key(self.consumer), 1, raw)
+        except RedisError as e:
+            logger.warning(f"Could not ack job, it may run again: {e}")
+
+    async def _requeue(self, job: dict, raw: Optional[str]) -> None:
+        """Hand an interrupted job back to the ready list (or the local queue)"""
+        if raw is None:
+            self._local.put_nowait(job)
+            return
+        try:
+            async with get_redis().pipeline(transaction=True) as pipe:
+                pipe.lrem(self._processing_key(self.consumer), 1, raw)
+                pipe.rpush(self._ready_key, raw)
+                await pipe.execute()
+        except RedisError as e:
+            logger.warning(f"Could not requeue job {job['id']}; it is recovered once this process's heartbeat expires: {e}")
+
+    async def _worker(self) -> None:
+        while True:
+            job, raw = await self._next_job()
+            if job is None:
+                continue
+            try:
+                await self._run(job)
+            except asyncio.CancelledError:
+                await self._requeue(job, raw)
+                raise
+            if raw is not None:
+                await self._ack(raw)
+
+    async def _listen(self) -> None:
+        """Queue broadcast jobs published by any process for the local workers"""
+        while get_redis() is not None:
+            try:
+                async with get_redis().pubsub() as pubsub:
+                    await pubsub.subscribe(self._broadcast_channel)
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            job = json.loads(message["data"])
+                            if job["name"] in self.handlers:
+                                self._local.put_nowait(job)
+            except RedisError as e:
+                logger.warning(f"Job broadcast subscription lost, resubscribing: {e}")
+                await asyncio.sleep(POLL_TIMEOUT_SECONDS)
+
+    async def _heartbeat(self, redis) -> None:
+        async with redis.pipeline(transaction=False) as pipe:
+            pipe.sadd(self._consumers_key, self.consumer)
+            pipe.set(self._heartbeat_key(self.consumer), 1, ex=CONSUMER_TTL_SECONDS)
+            await pipe.execute()
+
+    async def _recover_orphans(self, redis) -> None:
+        """Requeue jobs left in the processing lists of processes that died"""
+        for consumer in await redis.smembers(self._consumers_key):
+            if consumer == self.consumer or await redis.exists(self._heartbeat_key(consumer)):
+                continue
+            moved = 0
+            while await redis.rpoplpush(self._processing_key(consumer), self._ready_key) is not None:
+                moved += 1
+            await redis.srem(self._consumers_key, consumer)
+            if moved:
+                logger.warning(f"Requeued {moved} unfinished jobs of stopped worker process {consumer}")
+
+    async def _promote_due(self) -> None:
+        """Move due retries from the delayed set to the ready list, keep this
+        process's heartbeat alive and requeue jobs of dead processes.
+
+        ZREM decides which process moves a job, so each one is queued once.
+        """
+        last_recovery = 0.0
+        while True:
+            redis = get_redis()
+            if redis is not None:
+                try:
+                    await self._heartbeat(redis)
+                    if time.monotonic() - last_recovery >= CONSUMER_TTL_SECONDS:
+                        await self._recover_orphans(redis)
+                        last_recovery = time.monotonic()
+                    for raw in await redis.zrangebyscore(self._delayed_key, "-inf", time.time(), start=0, num=100):
+                        if await redis.zrem(self._delayed_key, raw):
+                            await redis.lpush(self._ready_key, raw)
+                except RedisError as e:
+                    logger.warning(f"Job retry promotion failed: {e}")
+            await asyncio.sleep(POLL_TIMEOUT_SECONDS)
+
+    def start(self, workers: int = None) -> None:
+        if self._tasks:
+            return
+        for _ in range(workers or settings.JOB_WORKERS):
+            self._tasks.append(asyncio.create_task(self._worker()))
+        self._tasks.append(asyncio.create_task(self._promote_due()))
+        self._tasks.append(asyncio.create_task(self._listen()))
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+        redis = get_redis()
+        if redis is not None:
+            try:
+                # Interrupted jobs were requeued above; anything still here goes back too
+                while await redis.rpoplpush(self._processing_key(self.consumer), self._ready_key) is not None:
+                    pass
+                await redis.srem(self._consumers_key, self.consumer)
+                await redis.delete(self._heartbeat_key(self.consumer))
+            except RedisError as e:
+                logger.warning(f"Job queue shutdown cleanup failed: {e}")
+        if not self._local.empty():
+            logger.warning(f"Discarding {self._local.qsize()} in-process jobs on shutdown")
+
+    def stats(self) -> dict:
+        return {
+            "backend": "redis" if get_redis() is not None else "in_process",
+            "workers": max(len(self._tasks) - 2, 0),
+            "enqueued": self.enqueued,
+            "completed": self.completed,
+            "retried": self.retried,
+            "dead": self.dead,
+            "local_pending": self._local.qsize(),
+        }
+
+
+job_queue = JobQueue()
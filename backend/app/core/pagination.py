@@ -0,0 +1,19 @@
+import base64
+import json
+from typing import Any, List
+from app.core.exceptions import InvalidCursorError
+
+def encode_cursor(sort: str, *values: Any) -> str:
+    """Opaque keyset cursor carrying the sort key and the last row's key values"""
+    payload = json.dumps([sort, *values], separators=(",", ":"), default=str)
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str, sort: str) -> List[Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, UnicodeError):
+        raise InvalidCursorError()
+    if not isinstance(payload, list) or not payload or payload[0] != sort:
+        raise InvalidCursorError("Cursor does not match the requested sort order")
+    return payload[1:]
@@ -0,0 +1,87 @@
+import statistics
+import time
+from typing import List, NamedTuple, Optional
+import argon2
+from pwdlib.hashers.argon2 import Argon2Hasher
+
+# Memory costs tried by calibration (KiB). A coarse grid keeps workers on
+# the same host landing on the same parameters.
+MEMORY_STEPS_KIB = [19456, 32768, 65536, 131072, 262144]
+MAX_TIME_COST = 10
+
+# OWASP floor for Argon2id; calibration never goes below it on slow hosts
+MIN_TIME_COST = 2
+MIN_MEMORY_KIB = 19456
+
+
+class Argon2Cost(NamedTuple):
+    time_cost: int
+    memory_cost: int
+
+# Parameters of PasswordHash.recommended() (argon2-cffi defaults)
+DEFAULT_COST = Argon2Cost(argon2.DEFAULT_TIME_COST, argon2.DEFAULT_MEMORY_COST)
+
+
+def measure_hash_ms(cost: Argon2Cost, rounds: int = 3) -> float:
+    """Median wall time of one Argon2id hash with the given cost"""
+    hasher = Argon2Hasher(time_cost=cost.time_cost, memory_cost=cost.memory_cost)
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        hasher.hash("calibration-password")
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def calibrate(target_ms: float, max_memory_kib: int) -> Argon2Cost:
+    """Strongest cost whose hash time fits target_ms on this host.
+
+    Memory is preferred over passes (it is what makes Argon2 expensive on
+    GPUs), so the largest memory step that fits one pass is chosen and the
+    remaining budget is spent on extra passes.
+    """
+    best: Optional[Argon2Cost] = None
+    for memory_cost in [m for m in MEMORY_STEPS_KIB if m <= max_memory_kib]:
+        one_pass_ms = measure_hash_ms(Argon2Cost(1, memory_cost))
+        if one_pass_ms > target_ms:
+            break
+        time_cost = min(MAX_TIME_COST, max(1, int(target_ms // one_pass_ms)))
+        best = Argon2Cost(time_cost, memory_cost)
+
+    if best is None or (best.memory_cost <= MIN_MEMORY_KIB and best.time_cost < MIN_TIME_COST):
+        return Argon2Cost(MIN_TIME_COST, MIN_MEMORY_KIB)
+    return best
+
+
+def hash_cost(hashed_password: str) -> Optional[Argon2Cost]:
+    try:
+        parameters = argon2.extract_parameters(hashed_password)
+    except argon2.exceptions.InvalidHashError:
+        return None
+    return Argon2Cost(parameters.time_cost, parameters.memory_cost)
+
+
+def work(cost: Argon2Cost) -> int:
+    """Memory blocks touched by one hash: Argon2 runtime grows with memory x passes"""
+    return cost.time_cost * cost.memory_cost
+
+
+def is_weaker(hashed_password: str, cost: Argon2Cost) -> bool:
+    """True when a stored hash does less work than `cost` (or is below the floor).
+
+    Hashes doing at least as much work are left alone, so workers that
+    calibrated to different parameters never keep rehashing each other's
+    output; the catalog converges on the most expensive calibration.
+    """
+    stored = hash_cost(hashed_password)
+    if stored is None or stored.memory_cost < MIN_MEMORY_KIB:
+        return True
+    return work(stored) < work(cost)
+
+
+def cost_table(memory_steps: List[int], time_costs: List[int], rounds: int = 3) -> List[dict]:
+    return [
+        {"memory_kib": m, "time_cost": t, "ms": measure_hash_ms(Argon2Cost(t, m), rounds)}
+        for m in memory_steps
+        for t in time_costs
+    ]
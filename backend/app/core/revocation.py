@@ -0,0 +1,93 @@
+import logging
+import time
+from typing import Dict, Set
+from redis.exceptions import RedisError
+from app.core.cache import get_redis
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Revoked token ids are grouped by the day their token expires, so a whole
+# bucket can be dropped once every token in it would be rejected anyway.
+BUCKET_SECONDS = 86400
+
+
+class TokenRevocationStore:
+    """Set of revoked token ids (jti) bucketed by token expiry.
+
+    Redis keeps one set per bucket with EXPIREAT at the bucket end, so the
+    store never holds more than the tokens still alive. Without Redis (or
+    when it fails) the in-process buckets stand in.
+
+    Per subject it also keeps a "revoked before" time: every refresh token
+    of that subject issued earlier is rejected (account deleted, password
+    changed).
+    """
+
+    def __init__(self, namespace: str = "revoked"):
+        self.namespace = namespace
+        self._buckets: Dict[int, Set[str]] = {}
+        self._subjects: Dict[str, float] = {}
+
+    @staticmethod
+    def _bucket(expires_at: float) -> int:
+        return int(expires_at) // BUCKET_SECONDS
+
+    def _redis_key(self, bucket: int) -> str:
+        return f"{self.namespace}:{bucket}"
+
+    def _prune(self) -> None:
+        current = self._bucket(time.time())
+        for bucket in [b for b in self._buckets if b < current]:
+            del self._buckets[bucket]
+
+    async def revoke(self, jti: str, expires_at: float) -> bool:
+        """Revoke a token id; False if it was already revoked (e.g. a replayed refresh)"""
+        self._prune()
+        bucket = self._bucket(expires_at)
+        local = self._buckets.setdefault(bucket, set())
+        newly_revoked = jti not in local
+        local.add(jti)
+
+        redis = get_redis()
+        if redis is not None:
+            key = self._redis_key(bucket)
+            try:
+                async with redis.pipeline(transaction=True) as pipe:
+                    pipe.sadd(key, jti)
+                    pipe.expireat(key, (bucket + 1) * BUCKET_SECONDS)
+                    added, _ = await pipe.execute()
+                newly_revoked = newly_revoked and bool(added)
+            except RedisError as e:
+                logger.warning(f"Token revocation write failed: {e}")
+        return newly_revoked
+
+    def _subject_key(self, subject: str) -> str:
+        return f"{self.namespace}:subject:{subject}"
+
+    async def revoke_subject(self, subject: str) -> None:
+        """Reject every refresh token issued to `subject` until now"""
+        now = time.time()
+        self._subjects[subject] = now
+        redis = get_redis()
+        if redis is not None:
+            try:
+                # Outlives every refresh token it could apply to
+                await redis.set(self._subject_key(subject), now, ex=settings.REFRESH_TOKEN_EXPIRE_DAYS * 86400)
+            except RedisError as e:
+                logger.warning(f"Subject revocation write failed: {e}")
+
+    async def subject_revoked_at(self, subject: str) -> float:
+        """Latest revoke_subject() time for `subject`, 0 if never revoked"""
+        revoked_at = self._subjects.get(subject, 0.0)
+        redis = get_redis()
+        if redis is not None:
+            try:
+                stored = await redis.get(self._subject_key(subject))
+                if stored is not None:
+                    revoked_at = max(revoked_at, float(stored))
+            except RedisError as e:
+                logger.warning(f"Subject revocation read failed: {e}")
+        return revoked_at
+
+revocation_store = TokenRevocationStore()
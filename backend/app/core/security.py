@@ -1,11 +1,26 @@
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Any, Union
+from typing import Any, Callable, Optional, Tuple, TypeVar, Union
+from uuid import uuid4
 import jwt
 from pwdlib import PasswordHash
+from pwdlib.hashers.argon2 import Argon2Hasher
 from app.core.config import settings
+from app.core.exceptions import ServiceBusyError
+from app.core.password_cost import DEFAULT_COST, Argon2Cost, calibrate, is_weaker
 
-# Initialize password hashing with Argon2
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Initialize password hashing with Argon2; calibrate_password_hash() may
+# replace it with host-tuned parameters at startup.
 password_hash = PasswordHash.recommended()
+password_hash_cost = DEFAULT_COST
 
 def create_access_token(subject: Union[str, Any], expires_delta: timedelta = None) -> str:
     if expires_delta:
@@ -14,16 +29,138 @@ def create_access_token(subject: Union[str, Any], expires_delta: timedelta = Non
         expire = datetime.now(timezone.utc) + timedelta(
             minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES
         )
-    to_encode = {"exp": expire, "sub": str(subject)}
+    to_encode = {"exp": expire, "sub": str(subject), "type": "access"}
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
+def create_refresh_token(subject: Union[str, Any]) -> Tuple[str, str]:
+    """Long-lived token only accepted by /auth/refresh; returns (token, jti)"""
+    expire = datetime.now(timezone.utc) + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+    jti = uuid4().hex
+    # Sub-second iat so a subject revocation cannot spare tokens from the same second
+    to_encode = {"exp": expire, "iat": time.time(), "sub": str(subject), "type": "refresh", "jti": jti}
+    return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM), jti
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return password_hash.verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
     return password_hash.hash(password)
 
+def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Verify, and return a new hash when the stored one is weaker than the current cost"""
+    if not password_hash.verify(plain_password, hashed_password):
+        return False, None
+    if is_weaker(hashed_password, password_hash_cost):
+        return True, password_hash.hash(plain_password)
+    return True, None
+
+def configure_password_hash(cost: Argon2Cost) -> None:
+    global password_hash, password_hash_cost
+    password_hash = PasswordHash((Argon2Hasher(time_cost=cost.time_cost, memory_cost=cost.memory_cost),))
+    password_hash_cost = cost
+
+def calibrate_password_hash() -> Argon2Cost:
+    """Tune the Argon2 cost to PASSWORD_HASH_TARGET_MS on this host (blocking)"""
+    if settings.PASSWORD_HASH_TARGET_MS > 0:
+        try:
+            cost = calibrate(settings.PASSWORD_HASH_TARGET_MS, settings.PASSWORD_HASH_MAX_MEMORY_KIB)
+        except Exception as e:
+            logger.error(f"Argon2 calibration failed, keeping current parameters: {e}")
+            return password_hash_cost
+        configure_password_hash(cost)
+        logger.info(
+            f"Argon2 calibrated to time_cost={cost.time_cost}, memory_cost={cost.memory_cost} KiB "
+            f"for a {settings.PASSWORD_HASH_TARGET_MS} ms target"
+        )
+    return password_hash_cost
+
+
+class PasswordHashPool:
+    """Runs Argon2 off the event loop on a CPU-sized thread pool.
+
+    Argon2 releases the GIL, so threads hash in parallel. At most `workers`
+    hashes run at once and at most `max_queue` callers wait for a slot;
+    beyond that callers get ServiceBusyError instead of piling up.
+    """
+
+    def __init__(self, workers: int = None, max_queue: int = None):
+        self.workers = workers or settings.PASSWORD_HASH_WORKERS or os.cpu_count() or 1
+        self.max_queue = max_queue if max_queue is not None else settings.PASSWORD_HASH_MAX_QUEUE
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+        self._slots = asyncio.Semaphore(self.workers)
+        self._waiting = 0
+        self.completed = 0
+        self.rejected = 0
+        self.wait_ms_total = 0.0
+        self.wait_ms_max = 0.0
+        self.hash_ms_total = 0.0
+        self.hash_ms_max = 0.0
+
+    async def run(self, func: Callable[..., T], *args) -> T:
+        if self._slots.locked() and self._waiting >= self.max_queue:
+            self.rejected += 1
+            raise ServiceBusyError()
+
+        queued_at = time.perf_counter()
+        self._waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self._waiting -= 1
+        try:
+            timings = {}
+
+            def timed():
+                started_at = time.perf_counter()
+                timings["wait"] = started_at - queued_at
+                try:
+                    return func(*args)
+                finally:
+                    timings["hash"] = time.perf_counter() - started_at
+
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self._executor, timed)
+        finally:
+            self._slots.release()
+
+        self._record(timings["wait"] * 1000, timings["hash"] * 1000)
+        return result
+
+    def _record(self, wait_ms: float, hash_ms: float) -> None:
+        self.completed += 1
+        self.wait_ms_total += wait_ms
+        self.wait_ms_max = max(self.wait_ms_max, wait_ms)
+        self.hash_ms_total += hash_ms
+        self.hash_ms_max = max(self.hash_ms_max, hash_ms)
+
+    def stats(self) -> dict:
+        completed = self.completed or 1
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "waiting": self._waiting,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "wait_ms_avg": round(self.wait_ms_total / completed, 2),
+            "wait_ms_max": round(self.wait_ms_max, 2),
+            "hash_ms_avg": round(self.hash_ms_total / completed, 2),
+            "hash_ms_max": round(self.hash_ms_max, 2),
+            "argon2_time_cost": password_hash_cost.time_cost,
+            "argon2_memory_kib": password_hash_cost.memory_cost,
+        }
+
+password_hash_pool = PasswordHashPool()
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await password_hash_pool.run(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    return await password_hash_pool.run(get_password_hash, password)
+
+async def verify_and_update_password_async(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    return await password_hash_pool.run(verify_and_update_password, plain_password, hashed_password)
+
 def decode_token(token: str) -> dict:
     try:
         decoded_token = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
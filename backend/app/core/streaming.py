@@ -0,0 +1,123 @@
+import asyncio
+import codecs
+import csv
+import io
+from typing import AsyncIterable, AsyncIterator, Dict, List, Optional
+from fastapi import Request
+from python_multipart.multipart import MultipartParser, parse_options_header
+from app.core.exceptions import EssenciaRabeException
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+async def iter_file_chunks(path: str, chunk_size: int = STREAM_CHUNK_SIZE) -> AsyncIterator[bytes]:
+    with open(path, "rb") as f:
+        while chunk := await asyncio.to_thread(f.read, chunk_size):
+            yield chunk
+
+
+async def iter_csv_rows(chunks: AsyncIterable[bytes]) -> AsyncIterator[Dict[str, str]]:
+    """Decode a byte stream incrementally and yield csv.DictReader-style rows.
+
+    Only complete records are handed to the csv module: a line is held back
+    while it sits inside an open quote, so quoted fields with embedded
+    newlines survive chunk boundaries. Memory stays bounded by the chunk
+    size plus the longest record.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    fieldnames: Optional[List[str]] = None
+    partial_line = ""
+    open_record: List[str] = []
+    open_quotes = 0
+
+    def complete_records(text: str, final: bool = False) -> List[str]:
+        nonlocal partial_line, open_quotes
+        lines = [line + "\n" for line in (partial_line + text).split("\n")]
+        partial_line = lines.pop()[:-1]
+        if final and partial_line:
+            lines.append(partial_line)
+            partial_line = ""
+
+        records = []
+        for line in lines:
+            open_record.append(line)
+            open_quotes += line.count('"')
+            if open_quotes % 2 == 0:
+                records.append("".join(open_record))
+                open_record.clear()
+                open_quotes = 0
+        if final and open_record:
+            records.append("".join(open_record))
+            open_record.clear()
+        return records
+
+    async def drain(records: List[str]):
+        nonlocal fieldnames
+        if not records:
+            return
+        if fieldnames is None:
+            fieldnames = next(csv.reader(io.StringIO(records[0])), [])
+            records = records[1:]
+        for row in csv.DictReader(io.StringIO("".join(records)), fieldnames=fieldnames):
+            yield row
+
+    async for chunk in chunks:
+        async for row in drain(complete_records(decoder.decode(chunk))):
+            yield row
+    async for row in drain(complete_records(decoder.decode(b"", final=True), final=True)):
+        yield row
+
+
+async def iter_multipart_file(request: Request, field_name: str = "file") -> AsyncIterator[bytes]:
+    """Yield the bytes of one multipart/form-data file field as they arrive.
+
+    Unlike request.form(), nothing is buffered or spooled to disk: each
+    network chunk is parsed and its file bytes are handed on immediately.
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise EssenciaRabeException("Expected a multipart/form-data upload", status_code=415)
+
+    pending: List[bytes] = []
+    state = {"header_field": b"", "header_value": b"", "in_field": False, "found": False}
+
+    def on_part_begin():
+        state["in_field"] = False
+
+    def on_header_field(data: bytes, start: int, end: int):
+        state["header_field"] += data[start:end]
+
+    def on_header_value(data: bytes, start: int, end: int):
+        state["header_value"] += data[start:end]
+
+    def on_header_end():
+        if state["header_field"].lower() == b"content-disposition":
+            _, disposition = parse_options_header(state["header_value"])
+            if disposition.get(b"name") == field_name.encode():
+                state["in_field"] = True
+                state["found"] = True
+        state["header_field"] = b""
+        state["header_value"] = b""
+
+    def on_part_data(data: bytes, start: int, end: int):
+        if state["in_field"]:
+            pending.append(data[start:end])
+
+    parser = MultipartParser(boundary, {
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_part_data": on_part_data,
+    })
+
+    async for body_chunk in request.stream():
+        parser.write(body_chunk)
+        for data in pending:
+            yield data
+        pending.clear()
+    parser.finalize()
+
+    if not state["found"]:
+        raise EssenciaRabeException(f"Missing '{field_name}' file field", status_code=400)
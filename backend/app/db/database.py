@@ -1,7 +1,12 @@
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+from sqlalchemy import inspect, text
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.asyncio import create_async_engine
 from sqlalchemy.orm import sessionmaker
 from sqlmodel.ext.asyncio.session import AsyncSession
 from app.core.config import settings
+from app.db.search import install_search_schema
 from sqlmodel import SQLModel
 from typing import Annotated
 from fastapi import Depends
@@ -20,10 +25,77 @@ async_session_maker = sessionmaker(
     expire_on_commit=False
 )
 
+def create_missing_indexes(connection) -> None:
+    """create_all skips tables that already exist, so add indexes declared since"""
+    for table in SQLModel.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
+
+def merge_duplicate_cart_items(connection) -> None:
+    """Fold duplicate (cart_id, product_id) rows left by the old read-then-insert
+    add_item, so uq_cartitem_cart_product can be built on an existing database"""
+    if any(ix["name"] == "uq_cartitem_cart_product" for ix in inspect(connection).get_indexes("cartitem")):
+        return
+    connection.execute(text("""
+        UPDATE cartitem SET quantity = (
+            SELECT SUM(other.quantity) FROM cartitem AS other
+            WHERE other.cart_id = cartitem.cart_id AND other.product_id = cartitem.product_id
+        )
+        WHERE id IN (
+            SELECT id FROM (
+                SELECT id, ROW_NUMBER() OVER (
+                    PARTITION BY cart_id, product_id ORDER BY created_at, id
+                ) AS position,
+                COUNT(*) OVER (PARTITION BY cart_id, product_id) AS copies
+                FROM cartitem
+            ) AS ranked WHERE position = 1 AND copies > 1
+        )
+    """))
+    connection.execute(text("""
+        DELETE FROM cartitem WHERE id IN (
+            SELECT id FROM (
+                SELECT id, ROW_NUMBER() OVER (
+                    PARTITION BY cart_id, product_id ORDER BY created_at, id
+                ) AS position
+                FROM cartitem
+            ) AS ranked WHERE position > 1
+        )
+    """))
+
 async def init_db():
     """Initialize database tables"""
     async with engine.begin() as eg:
         await eg.run_sync(SQLModel.metadata.create_all)
+        await eg.run_sync(merge_duplicate_cart_items)
+        await eg.run_sync(create_missing_indexes)
+        await install_search_schema(eg)
+
+def dialect_insert(db: AsyncSession, model):
+    """INSERT construct supporting ON CONFLICT for the session's database"""
+    if db.get_bind().dialect.name == "postgresql":
+        return postgresql.insert(model)
+    return sqlite.insert(model)
+
+@asynccontextmanager
+async def advisory_lock(key: int) -> AsyncIterator[bool]:
+    """Try to take a cluster-wide PostgreSQL advisory lock without waiting.
+
+    Yields whether this process holds the lock. Other databases have no
+    cross-process lock, so the caller is always treated as the holder.
+    """
+    if engine.dialect.name != "postgresql":
+        yield True
+        return
+
+    async with engine.connect() as conn:
+        acquired = await conn.scalar(text("SELECT pg_try_advisory_lock(:key)"), {"key": key})
+        await conn.commit()
+        try:
+            yield bool(acquired)
+        finally:
+            if acquired:
+                await conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": key})
+                await conn.commit()
 
 async def get_session() -> AsyncSession:
     """Dependency for getting async database session"""
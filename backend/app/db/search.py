@@ -0,0 +1,58 @@
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+# Spanish text search configuration that strips accents before stemming,
+# so "Limón", "limon" and "LIMÓN" all land on the same lexeme.
+SEARCH_CONFIG = "es_unaccent"
+
+POSTGRES_SEARCH_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    f"""
+    DO $$
+    BEGIN
+        IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = '{SEARCH_CONFIG}') THEN
+            CREATE TEXT SEARCH CONFIGURATION {SEARCH_CONFIG} (COPY = spanish);
+            ALTER TEXT SEARCH CONFIGURATION {SEARCH_CONFIG}
+                ALTER MAPPING FOR hword, hword_part, word WITH unaccent, spanish_stem;
+        END IF;
+    END
+    $$
+    """,
+    f"""
+    CREATE OR REPLACE FUNCTION product_search_document(
+        name text, brand text, description text, fragrance_family text,
+        notes_top text, notes_heart text, notes_base text
+    ) RETURNS tsvector
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+        SELECT
+            setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(name, '') || ' ' || coalesce(brand, '')), 'A')
+            || setweight(to_tsvector('{SEARCH_CONFIG}',
+                coalesce(fragrance_family, '') || ' ' || coalesce(notes_top, '') || ' '
+                || coalesce(notes_heart, '') || ' ' || coalesce(notes_base, '')), 'B')
+            || setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(description, '')), 'C')
+    $$
+    """,
+    """
+    CREATE OR REPLACE FUNCTION product_search_label(name text, brand text) RETURNS text
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+        SELECT lower(public.unaccent('public.unaccent', coalesce(name, '') || ' ' || coalesce(brand, '')))
+    $$
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS ix_product_search_document ON product USING GIN (
+        product_search_document(name, brand, description, fragrance_family, notes_top, notes_heart, notes_base)
+    )
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS ix_product_search_label ON product
+    USING GIN (product_search_label(name, brand) gin_trgm_ops)
+    """,
+]
+
+async def install_search_schema(conn: AsyncConnection) -> None:
+    """Create the full-text and trigram search indexes (PostgreSQL only)"""
+    if conn.dialect.name != "postgresql":
+        return
+    for statement in POSTGRES_SEARCH_DDL:
+        await conn.execute(text(statement))
@@ -1,25 +1,42 @@
-from contextlib import asynccontextmanager
+import asyncio
+from contextlib import asynccontextmanager, suppress
 from fastapi import FastAPI, Request
 from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
-from app.db.database import init_db, async_session_maker
+from app.db.database import init_db
 from app.core.exceptions import EssenciaRabeException
+from app.core.cache import close_redis
+from app.core.jobs import job_queue
+from app.core.security import calibrate_password_hash
 from app.services.product_service import product_service
+from app.services.reservation_service import reservation_service
 
-from app.api.v1 import auth, users, products, cart, orders
+from app.api.v1 import auth, users, products, cart, orders, metrics
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup logic
     await init_db()
     
-    # Sync products from CSV on startup
-    async with async_session_maker() as db:
-        await product_service.sync_from_csv(db)
+    # Sync products from CSV in the background so readiness isn't blocked
+    sync_task = asyncio.create_task(product_service.sync_on_startup())
+    # Argon2 calibration hashes for a few seconds; run it on a thread meanwhile
+    calibration_task = asyncio.create_task(asyncio.to_thread(calibrate_password_hash))
+    # Expired stock reservations go back on sale
+    sweeper_task = asyncio.create_task(reservation_service.run_sweeper())
+    # Post-checkout and post-import side effects
+    job_queue.start()
     
     yield
-    # Shutdown logic (if any) can go here
+    # Shutdown logic
+    for task in (sync_task, calibration_task, sweeper_task):
+        task.cancel()
+    for task in (sync_task, calibration_task, sweeper_task):
+        with suppress(asyncio.CancelledError):
+            await task
+    await job_queue.stop()
+    await close_redis()
 
 app = FastAPI(
     title=settings.APP_NAME,
@@ -42,6 +59,7 @@ app.include_router(users.router, prefix=f"{settings.API_V1_PREFIX}/users", tags=
 app.include_router(products.router, prefix=f"{settings.API_V1_PREFIX}/products", tags=["products"])
 app.include_router(cart.router, prefix=f"{settings.API_V1_PREFIX}/cart", tags=["cart"])
 app.include_router(orders.router, prefix=f"{settings.API_V1_PREFIX}/orders", tags=["orders"])
+app.include_router(metrics.router, prefix=f"{settings.API_V1_PREFIX}/metrics", tags=["metrics"])
 
 # Set CORS middleware
 if settings.CORS_ORIGINS:
@@ -51,6 +69,7 @@ if settings.CORS_ORIGINS:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=["X-Next-Cursor", "ETag"],
     )
 
 
@@ -1,13 +1,21 @@
-from sqlmodel import SQLModel
+from sqlmodel import SQLModel, Field
 from typing import List, Optional
 from uuid import UUID
 
 class CartItemCreate(SQLModel):
     product_id: UUID
-    quantity: int
+    quantity: int = Field(gt=0)
 
 class CartItemUpdate(SQLModel):
-    quantity: int
+    quantity: int = Field(gt=0)
+
+class CartItemSet(SQLModel):
+    product_id: UUID
+    quantity: int = Field(ge=0)
+
+class CartBatchUpdate(SQLModel):
+    """Target quantity per product: 0 removes, a product not yet in the cart is added"""
+    items: List[CartItemSet] = Field(min_length=1, max_length=100)
 
 class ProductInCart(SQLModel):
     id: UUID
@@ -23,8 +31,14 @@ class CartItemResponse(SQLModel):
     price_at_addition: float
     subtotal: float
 
+class CartSummary(SQLModel):
+    line_count: int
+    total_items: int
+    total_amount: float
+
 class CartResponse(SQLModel):
-    id: UUID
+    # None until the user's first cart write
+    id: Optional[UUID] = None
     items: List[CartItemResponse]
     total_amount: float
     total_items: int
@@ -1,6 +1,7 @@
 from uuid import UUID, uuid4
 from datetime import datetime
 from typing import Optional, List
+from sqlalchemy import Index, text
 from sqlmodel import SQLModel, Field, Relationship
 from app.core.enums import ProductType, OrderStatus
 
@@ -38,6 +39,27 @@ class ProductBase(SQLModel):
     is_active: bool = True
 
 class Product(ProductBase, table=True):
+    __table_args__ = (
+        # Natural key of a catalog entry; target of the CSV import upsert
+        Index("uq_product_name_brand_type", "name", "brand", "type", unique=True),
+        # Keyset pagination keys for list_products sort orders
+        Index("ix_product_name_id", "name", "id"),
+        Index("ix_product_price_id", "price", "id"),
+        # Type filter combined with a price range and/or price sort
+        Index("ix_product_type_price_id", "type", "price", "id"),
+        # in_stock_only listings; partial so sold-out rows don't bloat them
+        Index(
+            "ix_product_in_stock_name_id", "name", "id",
+            postgresql_where=text("stock_quantity > 0"),
+            sqlite_where=text("stock_quantity > 0"),
+        ),
+        Index(
+            "ix_product_in_stock_price_id", "price", "id",
+            postgresql_where=text("stock_quantity > 0"),
+            sqlite_where=text("stock_quantity > 0"),
+        ),
+    )
+
     id: UUID = Field(default_factory=uuid4, primary_key=True)
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
@@ -46,6 +68,11 @@ class Product(ProductBase, table=True):
     cart_items: List["CartItem"] = Relationship(back_populates="product")
 
 class CartItem(SQLModel, table=True):
+    __table_args__ = (
+        # One row per product in a cart; target of the add_item upsert
+        Index("uq_cartitem_cart_product", "cart_id", "product_id", unique=True),
+    )
+
     id: UUID = Field(default_factory=uuid4, primary_key=True)
     cart_id: UUID = Field(foreign_key="cart.id", index=True)
     product_id: UUID = Field(foreign_key="product.id")
@@ -67,6 +94,20 @@ class Cart(SQLModel, table=True):
     user: "User" = Relationship()
     items: List[CartItem] = Relationship(back_populates="cart")
 
+class StockReservation(SQLModel, table=True):
+    """Units taken off product.stock_quantity for a pending checkout.
+
+    Expired rows are deleted by the sweeper, which puts the units back and
+    cancels the pending order they were held for.
+    """
+    id: UUID = Field(default_factory=uuid4, primary_key=True)
+    user_id: UUID = Field(foreign_key="user.id", index=True)
+    order_id: Optional[UUID] = Field(default=None, foreign_key="order.id", index=True)
+    product_id: UUID = Field(foreign_key="product.id")
+    quantity: int
+    expires_at: datetime = Field(index=True)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
 class OrderItem(SQLModel, table=True):
     id: UUID = Field(default_factory=uuid4, primary_key=True)
     order_id: UUID = Field(foreign_key="order.id", index=True)
@@ -79,6 +120,11 @@ class OrderItem(SQLModel, table=True):
     product: "Product" = Relationship()
 
 class Order(SQLModel, table=True):
+    __table_args__ = (
+        # Keyset pagination of order history, newest first
+        Index("ix_order_user_created_id", "user_id", "created_at", "id"),
+        Index("ix_order_created_id", "created_at", "id"),
+    )
     id: UUID = Field(default_factory=uuid4, primary_key=True)
     user_id: UUID = Field(foreign_key="user.id", index=True)
     total_amount: float
@@ -90,3 +136,9 @@ class Order(SQLModel, table=True):
     # Relationships
     user: "User" = Relationship()
     items: List[OrderItem] = Relationship(back_populates="order")
+
+class CatalogSync(SQLModel, table=True):
+    """Last CSV applied to the catalog, so unchanged files are not re-imported"""
+    source: str = Field(primary_key=True)
+    content_hash: str
+    applied_at: datetime = Field(default_factory=datetime.utcnow)
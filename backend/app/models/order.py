@@ -0,0 +1,29 @@
+from sqlmodel import SQLModel
+from typing import List
+from uuid import UUID
+from datetime import datetime
+from app.core.enums import OrderStatus
+
+class OrderItemResponse(SQLModel):
+    id: UUID
+    product_id: UUID
+    name: str
+    brand: str
+    quantity: int
+    price_at_purchase: float
+    subtotal: float
+
+class OrderResponse(SQLModel):
+    id: UUID
+    user_id: UUID
+    status: OrderStatus
+    total_amount: float
+    whatsapp_message_sent: bool
+    created_at: datetime
+    items: List[OrderItemResponse]
+
+class CheckoutResponse(SQLModel):
+    message: str
+    order_id: UUID
+    whatsapp_text: str
+    whatsapp_link: str
@@ -1,7 +1,9 @@
 from sqlmodel import SQLModel
-from typing import Optional
+from typing import List, Optional
 from uuid import UUID
+from datetime import datetime
 from app.models.core import ProductType
+from app.core.enums import ImportStatus
 
 class ProductCreate(SQLModel):
     name: str
@@ -20,4 +22,74 @@ class ProductCreate(SQLModel):
 
 class ProductResponse(ProductCreate):
     id: UUID
-    is_active: bool
\ No newline at end of file
+    is_active: bool
+
+
+class ProductSparse(SQLModel):
+    """Listing item under ?fields=: id plus only the requested fields"""
+    id: UUID
+    name: Optional[str] = None
+    brand: Optional[str] = None
+    type: Optional[ProductType] = None
+    size_ml: Optional[int] = None
+    price: Optional[float] = None
+    stock_quantity: Optional[int] = None
+    description: Optional[str] = None
+    fragrance_family: Optional[str] = None
+    notes_top: Optional[str] = None
+    notes_heart: Optional[str] = None
+    notes_base: Optional[str] = None
+    image_url: Optional[str] = None
+    is_active: Optional[bool] = None
+
+
+class ProductPage(SQLModel):
+    items: List[ProductResponse]
+    next_cursor: Optional[str] = None
+
+
+class ProductBatch(SQLModel):
+    items: List[ProductResponse]
+    missing: List[UUID]
+
+
+class SimilarProduct(SQLModel):
+    id: UUID
+    name: str
+    brand: str
+    type: ProductType
+    price: float
+    image_url: Optional[str] = None
+    score: float
+
+
+class FacetCount(SQLModel):
+    value: str
+    count: int
+
+
+class PriceRangeCount(SQLModel):
+    min_price: float
+    max_price: Optional[float] = None
+    count: int
+
+
+class ProductFacets(SQLModel):
+    total: int
+    brands: List[FacetCount]
+    types: List[FacetCount]
+    fragrance_families: List[FacetCount]
+    price_ranges: List[PriceRangeCount]
+
+
+class ImportJob(SQLModel):
+    job_id: UUID
+    status: ImportStatus = ImportStatus.RUNNING
+    bytes_received: int = 0
+    rows_processed: int = 0
+    added: int = 0
+    updated: int = 0
+    error_count: int = 0
+    errors: List[str] = []
+    started_at: datetime
+    finished_at: Optional[datetime] = None
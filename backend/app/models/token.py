@@ -1,5 +1,11 @@
+from typing import Optional
 from sqlmodel import SQLModel
 
 class Token(SQLModel):
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None
+
+
+class RefreshTokenRequest(SQLModel):
+    refresh_token: str
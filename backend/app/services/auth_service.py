@@ -1,9 +1,13 @@
 from datetime import timedelta
+from uuid import UUID
 from sqlmodel.ext.asyncio.session import AsyncSession
-from app.core.security import verify_password, create_access_token
+from app.core.security import verify_and_update_password_async, create_access_token, create_refresh_token, decode_token
+from app.core.revocation import revocation_store
+from app.core.cache import principal_cache
 from app.services.user_service import user_service
 from app.core.config import settings
 from app.core.exceptions import AuthenticationError
+from app.models.core import User
 from app.models.token import Token
 
 class AuthService:
@@ -14,19 +18,75 @@ class AuthService:
         if not user:
             user = await user_service.get_by_email(db, username_or_email)
             
-        if not user or not verify_password(password, user.hashed_password):
+        if not user:
+            raise AuthenticationError("Incorrect username/email or password")
+        valid, new_hash = await verify_and_update_password_async(password, user.hashed_password)
+        if not valid:
             raise AuthenticationError("Incorrect username/email or password")
+        if new_hash:
+            # Stored with an outdated Argon2 cost; upgrade while we have the password
+            await user_service.update(db, user, {"hashed_password": new_hash})
         
+        return AuthService.issue_tokens(user.id)
+
+    @staticmethod
+    def issue_tokens(subject) -> Token:
         access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
         access_token = create_access_token(
-            subject=user.id, expires_delta=access_token_expires
+            subject=subject, expires_delta=access_token_expires
         )
+        refresh_token, _ = create_refresh_token(subject)
         
         return Token(
             access_token=access_token,
-            token_type="bearer"
+            token_type="bearer",
+            refresh_token=refresh_token
         )
 
+    @staticmethod
+    def _decode_refresh_token(refresh_token: str) -> dict:
+        token_data = decode_token(refresh_token)
+        if not token_data or token_data.get("type") != "refresh" or not token_data.get("jti"):
+            raise AuthenticationError("Invalid refresh token")
+        return token_data
+
+    @staticmethod
+    async def _subject_is_active(db: AsyncSession, subject: str) -> bool:
+        """Whether the token subject still exists and is active, principal cache first"""
+        cached = await principal_cache.get(subject)
+        if cached is not None:
+            return cached["is_active"]
+        try:
+            user = await db.get(User, UUID(subject))
+        except ValueError:
+            return False
+        return user is not None and user.is_active
+
+    @staticmethod
+    async def refresh(db: AsyncSession, refresh_token: str) -> Token:
+        """Rotate a refresh token: signature check plus one revocation-set write.
+
+        The presented token is revoked as it is exchanged, so replaying it
+        (or racing two refreshes with it) fails. Tokens of deleted or
+        inactive users, or issued before the user's last password change,
+        are refused.
+        """
+        token_data = AuthService._decode_refresh_token(refresh_token)
+        subject = token_data.get("sub") or ""
+        if token_data.get("iat", 0) < await revocation_store.subject_revoked_at(subject):
+            raise AuthenticationError("Refresh token has been revoked")
+        if not await AuthService._subject_is_active(db, subject):
+            raise AuthenticationError("Invalid refresh token")
+        if not await revocation_store.revoke(token_data["jti"], token_data["exp"]):
+            raise AuthenticationError("Refresh token has been revoked")
+        return AuthService.issue_tokens(subject)
+
+    @staticmethod
+    async def logout(refresh_token: str) -> dict:
+        token_data = AuthService._decode_refresh_token(refresh_token)
+        await revocation_store.revoke(token_data["jti"], token_data["exp"])
+        return {"message": "Logged out successfully"}
+
     @staticmethod
     async def register(db: AsyncSession, user_data: dict) -> dict:
         await user_service.create(db, user_data)
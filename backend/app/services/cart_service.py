@@ -1,37 +1,59 @@
-from typing import Tuple
-from uuid import UUID
+import hashlib
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+from uuid import UUID, uuid4
+from sqlalchemy import delete, func, literal, update
 from sqlmodel import select, and_
 from sqlalchemy.orm import selectinload
 from sqlmodel.ext.asyncio.session import AsyncSession
-from app.models.core import Cart, CartItem
-from app.models.cart import CartResponse, CartItemResponse, ProductInCart
+from app.models.core import Cart, CartItem, Product
+from app.models.cart import CartResponse, CartItemResponse, ProductInCart, CartSummary
+from app.core.cache import cart_summary_cache
 from app.services.product_service import product_service
-from app.core.exceptions import OutOfStockError, EntityNotFoundError, PermissionDeniedError
+from app.db.database import dialect_insert
+from app.core.exceptions import OutOfStockError, EntityNotFoundError, PermissionDeniedError, ProductNotFoundError
 
 class CartService:
     @staticmethod
-    async def get_or_create_cart(db: AsyncSession, user_id: UUID) -> Cart:
+    async def get_cart(db: AsyncSession, user_id: UUID) -> Optional[Cart]:
+        """The user's cart with items and products loaded, or None if never created"""
+        # populate_existing: a cart loaded earlier in this session must not hide
+        # rows written since by the set-based item statements
         statement = select(Cart).where(Cart.user_id == user_id).options(
             selectinload(Cart.items).selectinload(CartItem.product)
-        )
+        ).execution_options(populate_existing=True)
         result = await db.execute(statement)
-        cart = result.scalar_one_or_none()
-        
-        if not cart:
-            cart = Cart(user_id=user_id)
-            db.add(cart)
-            await db.commit()
-            await db.refresh(cart)
-            statement = select(Cart).where(Cart.id == cart.id).options(
-                selectinload(Cart.items).selectinload(CartItem.product)
-            )
-            result = await db.execute(statement)
-            cart = result.scalar_one()
-        
-        return cart
+        return result.scalar_one_or_none()
+
+    @staticmethod
+    async def get_cart_id(db: AsyncSession, user_id: UUID) -> Optional[UUID]:
+        result = await db.execute(select(Cart.id).where(Cart.user_id == user_id))
+        return result.scalar_one_or_none()
+
+    @staticmethod
+    async def ensure_cart(db: AsyncSession, user_id: UUID) -> UUID:
+        """Id of the user's cart, creating it if needed, without committing.
+
+        The insert is ON CONFLICT (user_id) DO NOTHING, so concurrent first
+        writes settle on one cart; it joins the caller's transaction.
+        """
+        cart_id = await CartService.get_cart_id(db, user_id)
+        if cart_id is not None:
+            return cart_id
+
+        now = datetime.utcnow()
+        statement = dialect_insert(db, Cart).values(
+            id=uuid4(), user_id=user_id, created_at=now, updated_at=now
+        ).on_conflict_do_nothing(index_elements=["user_id"]).returning(Cart.id)
+        cart_id = (await db.execute(statement)).scalar_one_or_none()
+        if cart_id is None:
+            cart_id = await CartService.get_cart_id(db, user_id)
+        return cart_id
 
     async def get_cart_for_user(self, db: AsyncSession, user_id: UUID) -> CartResponse:
-        cart = await self.get_or_create_cart(db, user_id)
+        cart = await self.get_cart(db, user_id)
+        if cart is None:
+            return CartResponse(id=None, items=[], total_amount=0.0, total_items=0)
         total_amount, total_items = self.calculate_total(cart)
         
         items_response = []
@@ -58,70 +80,198 @@ class CartService:
         )
 
     @staticmethod
-    async def add_item(db: AsyncSession, cart_id: UUID, product_id: UUID, quantity: int) -> CartItem:
-        product = await product_service.get_by_id(db, product_id)
-        if product.stock_quantity < quantity:
-            raise OutOfStockError(product.name, quantity, product.stock_quantity)
-            
-        statement = select(CartItem).where(
-            and_(CartItem.cart_id == cart_id, CartItem.product_id == product_id)
+    async def invalidate(user_id: UUID) -> None:
+        """Drop per-user cart caches; called after every committed cart mutation"""
+        await cart_summary_cache.delete(str(user_id))
+
+    @staticmethod
+    async def fingerprint(db: AsyncSession, user_id: UUID) -> str:
+        """Digest of the cart rows as committed; any add, update or removal changes it.
+
+        Rows get a fresh id when added, so a checked-out cart never comes back
+        with the same value; only the empty cart repeats.
+        """
+        result = await db.execute(
+            select(CartItem.id, CartItem.quantity, CartItem.price_at_addition)
+            .join(Cart, Cart.id == CartItem.cart_id)
+            .where(Cart.user_id == user_id)
+            .order_by(CartItem.id)
         )
-        result = await db.execute(statement)
-        cart_item = result.scalar_one_or_none()
-        
-        if cart_item:
-            cart_item.quantity += quantity
-            cart_item.price_at_addition = product.price
-        else:
-            cart_item = CartItem(
-                cart_id=cart_id,
-                product_id=product_id,
-                quantity=quantity,
-                price_at_addition=product.price
+        raw = "|".join(f"{row.id}:{row.quantity}:{row.price_at_addition}" for row in result.all())
+        return hashlib.blake2b(raw.encode(), digest_size=16).hexdigest()
+
+    async def get_summary(self, db: AsyncSession, user_id: UUID) -> dict:
+        """Item count and total from one aggregate; no ORM objects are loaded"""
+        key = str(user_id)
+        cached = await cart_summary_cache.get(key)
+        if cached is not None:
+            return cached
+
+        statement = (
+            select(
+                func.count(CartItem.id).label("line_count"),
+                func.coalesce(func.sum(CartItem.quantity), 0).label("total_items"),
+                func.coalesce(func.sum(CartItem.quantity * CartItem.price_at_addition), 0.0).label("total_amount"),
             )
-            db.add(cart_item)
-            
+            .join(Cart, Cart.id == CartItem.cart_id)
+            .where(Cart.user_id == user_id)
+        )
+        row = (await db.execute(statement)).one()
+        summary = CartSummary(
+            line_count=row.line_count, total_items=row.total_items, total_amount=row.total_amount
+        ).model_dump(mode="json")
+        await cart_summary_cache.set(key, summary)
+        return summary
+
+    async def add_item(self, db: AsyncSession, user_id: UUID, product_id: UUID, quantity: int) -> Tuple[UUID, int]:
+        """Add to the cart in one statement; returns (item id, new quantity).
+
+        INSERT ... SELECT from product only yields a row when the product
+        exists with enough stock, and ON CONFLICT on (cart_id, product_id)
+        folds repeat adds into the existing row. The product is only read
+        separately to explain a failure.
+        """
+        cart_id = await self.ensure_cart(db, user_id)
+        source = select(
+            literal(uuid4()), literal(cart_id), Product.id, literal(quantity), Product.price,
+            literal(datetime.utcnow())
+        ).where(Product.id == product_id, Product.stock_quantity >= quantity)
+
+        insert = dialect_insert(db, CartItem).from_select(
+            ["id", "cart_id", "product_id", "quantity", "price_at_addition", "created_at"], source
+        )
+        statement = insert.on_conflict_do_update(
+            index_elements=["cart_id", "product_id"],
+            set_={
+                "quantity": CartItem.quantity + insert.excluded.quantity,
+                "price_at_addition": insert.excluded.price_at_addition,
+            },
+        ).returning(CartItem.id, CartItem.quantity)
+
+        row = (await db.execute(statement)).first()
+        if row is None:
+            await db.rollback()
+            product = await product_service.get_by_id(db, product_id)
+            raise OutOfStockError(product.name, quantity, product.stock_quantity)
         await db.commit()
-        await db.refresh(cart_item)
-        return cart_item
+        await self.invalidate(user_id)
+        return row.id, row.quantity
 
-    async def update_cart_item(self, db: AsyncSession, user_id: UUID, item_id: UUID, quantity: int) -> None:
-        cart_item = await db.get(CartItem, item_id)
-        if not cart_item:
+    @staticmethod
+    def _owned_item(user_id: UUID, item_id: UUID):
+        """WHERE clause matching the item only if it sits in the user's cart"""
+        return and_(
+            CartItem.id == item_id,
+            CartItem.cart_id.in_(select(Cart.id).where(Cart.user_id == user_id))
+        )
+
+    @staticmethod
+    async def _explain_failed_mutation(db: AsyncSession, user_id: UUID, item_id: UUID, quantity: int = None):
+        """Raise the error for an item mutation that matched no row"""
+        statement = (
+            select(Cart.user_id, Product.name, Product.stock_quantity)
+            .join(CartItem, CartItem.cart_id == Cart.id)
+            .join(Product, Product.id == CartItem.product_id)
+            .where(CartItem.id == item_id)
+        )
+        row = (await db.execute(statement)).first()
+        if row is None:
             raise EntityNotFoundError("CartItem", item_id)
-            
-        cart = await self.get_or_create_cart(db, user_id)
-        if cart_item.cart_id != cart.id:
-            raise PermissionDeniedError("Not authorized to update this item")
-            
-        product = await product_service.get_by_id(db, cart_item.product_id)
-        if product.stock_quantity < quantity:
-            raise OutOfStockError(product.name, quantity, product.stock_quantity)
-            
-        cart_item.quantity = quantity
-        db.add(cart_item)
+        if row.user_id != user_id:
+            raise PermissionDeniedError("Not authorized to modify this item")
+        raise OutOfStockError(row.name, quantity, row.stock_quantity)
+
+    async def update_cart_item(self, db: AsyncSession, user_id: UUID, item_id: UUID, quantity: int) -> None:
+        """Ownership and stock are checked by the UPDATE itself; reads only happen on failure"""
+        in_stock = select(Product.id).where(
+            Product.id == CartItem.product_id, Product.stock_quantity >= quantity
+        ).exists()
+        statement = (
+            update(CartItem)
+            .where(self._owned_item(user_id, item_id), in_stock)
+            .values(quantity=quantity)
+            .returning(CartItem.id)
+            .execution_options(synchronize_session=False)
+        )
+        if (await db.execute(statement)).first() is None:
+            await db.rollback()
+            await self._explain_failed_mutation(db, user_id, item_id, quantity)
         await db.commit()
+        await self.invalidate(user_id)
 
     async def remove_cart_item(self, db: AsyncSession, user_id: UUID, item_id: UUID) -> None:
-        cart_item = await db.get(CartItem, item_id)
-        if not cart_item:
-            raise EntityNotFoundError("CartItem", item_id)
-            
-        cart = await self.get_or_create_cart(db, user_id)
-        if cart_item.cart_id != cart.id:
-            raise PermissionDeniedError("Not authorized to remove this item")
-            
-        await db.delete(cart_item)
+        statement = (
+            delete(CartItem)
+            .where(self._owned_item(user_id, item_id))
+            .returning(CartItem.id)
+            .execution_options(synchronize_session=False)
+        )
+        if (await db.execute(statement)).first() is None:
+            await db.rollback()
+            await self._explain_failed_mutation(db, user_id, item_id)
         await db.commit()
+        await self.invalidate(user_id)
 
-    @staticmethod
-    async def clear_cart(db: AsyncSession, cart_id: UUID) -> None:
-        statement = select(CartItem).where(CartItem.cart_id == cart_id)
-        result = await db.execute(statement)
-        items = result.scalars().all()
-        for item in items:
-            await db.delete(item)
+    async def set_quantities(self, db: AsyncSession, user_id: UUID, quantities: Dict[UUID, int]) -> None:
+        """Apply a batch of target quantities in one transaction.
+
+        One SELECT checks every product's stock up front, then one DELETE
+        drops zeroed products and one multi-row upsert writes the rest.
+        Nothing is written if any product is missing or short on stock.
+        """
+        wanted = {product_id: q for product_id, q in quantities.items() if q > 0}
+        removed = [product_id for product_id, q in quantities.items() if q == 0]
+
+        if wanted:
+            result = await db.execute(
+                select(Product.id, Product.name, Product.price, Product.stock_quantity)
+                .where(Product.id.in_(list(wanted)))
+            )
+            products = {row.id: row for row in result.all()}
+            for product_id, quantity in wanted.items():
+                product = products.get(product_id)
+                if product is None:
+                    raise ProductNotFoundError(product_id)
+                if product.stock_quantity < quantity:
+                    raise OutOfStockError(product.name, quantity, product.stock_quantity)
+
+        cart_id = await self.ensure_cart(db, user_id)
+        if removed:
+            await db.execute(
+                delete(CartItem)
+                .where(CartItem.cart_id == cart_id, CartItem.product_id.in_(removed))
+                .execution_options(synchronize_session=False)
+            )
+        if wanted:
+            now = datetime.utcnow()
+            insert = dialect_insert(db, CartItem).values([
+                {
+                    "id": uuid4(),
+                    "cart_id": cart_id,
+                    "product_id": product_id,
+                    "quantity": quantity,
+                    "price_at_addition": products[product_id].price,
+                    "created_at": now,
+                }
+                for product_id, quantity in wanted.items()
+            ])
+            await db.execute(insert.on_conflict_do_update(
+                index_elements=["cart_id", "product_id"],
+                set_={
+                    "quantity": insert.excluded.quantity,
+                    "price_at_addition": insert.excluded.price_at_addition,
+                },
+            ))
+        await db.commit()
+        await self.invalidate(user_id)
+
+    async def clear_cart(self, db: AsyncSession, user_id: UUID) -> None:
+        user_cart = select(Cart.id).where(Cart.user_id == user_id)
+        await db.execute(
+            delete(CartItem).where(CartItem.cart_id.in_(user_cart)).execution_options(synchronize_session=False)
+        )
         await db.commit()
+        await self.invalidate(user_id)
 
     @staticmethod
     def calculate_total(cart: Cart) -> Tuple[float, int]:
@@ -0,0 +1,87 @@
+from datetime import datetime
+from typing import AsyncIterable, AsyncIterator, Optional
+from uuid import UUID, uuid4
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.core.cache import import_job_cache
+from app.core.enums import ImportStatus
+from app.core.exceptions import EntityNotFoundError, EssenciaRabeException
+from app.models.product import ImportJob
+from app.services.product_service import product_service
+
+MAX_REPORTED_ERRORS = 100
+
+class BoundedErrorList(list):
+    """Keeps the first `limit` error messages and only counts the rest"""
+
+    def __init__(self, limit: int):
+        super().__init__()
+        self.limit = limit
+        self.total = 0
+
+    def append(self, message: str) -> None:
+        self.total += 1
+        if len(self) < self.limit:
+            super().append(message)
+
+
+class ImportService:
+    """Import jobs live in import_job_cache (Redis when configured), so progress
+    can be read from any worker while the importing one streams the upload."""
+
+    async def get_job(self, job_id: UUID) -> ImportJob:
+        job = await import_job_cache.get(str(job_id))
+        if not job:
+            raise EntityNotFoundError("ImportJob", job_id)
+        return ImportJob.model_validate(job)
+
+    async def _publish(self, job: ImportJob) -> None:
+        await import_job_cache.set(str(job.job_id), job.model_dump(mode="json"))
+
+    async def create_job(self) -> ImportJob:
+        """Reserve a job id before uploading, so progress can be polled during the upload"""
+        job = ImportJob(job_id=uuid4(), status=ImportStatus.PENDING, started_at=datetime.utcnow())
+        await self._publish(job)
+        return job
+
+    async def run_upload(
+        self, db: AsyncSession, chunks: AsyncIterable[bytes], job_id: Optional[UUID] = None
+    ) -> ImportJob:
+        """Stream an uploaded CSV into the catalog, publishing progress on the job"""
+        if job_id is None:
+            job = ImportJob(job_id=uuid4(), started_at=datetime.utcnow())
+        else:
+            job = await self.get_job(job_id)
+            if job.status != ImportStatus.PENDING:
+                raise EssenciaRabeException(f"Import job {job_id} is already {job.status.value}", status_code=409)
+            job.status = ImportStatus.RUNNING
+            job.started_at = datetime.utcnow()
+        await self._publish(job)
+        errors = BoundedErrorList(MAX_REPORTED_ERRORS)
+        summary = {"added": 0, "updated": 0, "errors": errors}
+
+        async def counted(source: AsyncIterable[bytes]) -> AsyncIterator[bytes]:
+            async for chunk in source:
+                job.bytes_received += len(chunk)
+                yield chunk
+
+        async def on_chunk(progress: dict) -> None:
+            job.added = progress["added"]
+            job.updated = progress["updated"]
+            job.error_count = errors.total
+            job.errors = list(errors)
+            job.rows_processed = job.added + job.updated + job.error_count
+            await self._publish(job)
+
+        try:
+            await product_service.import_stream(db, counted(chunks), summary, on_chunk)
+            job.status = ImportStatus.COMPLETED
+        except Exception:
+            await db.rollback()
+            job.status = ImportStatus.FAILED
+            raise
+        finally:
+            job.finished_at = datetime.utcnow()
+            await on_chunk(summary)
+        return job
+
+import_service = ImportService()
@@ -1,29 +1,94 @@
+import logging
+from datetime import datetime
+from typing import List, Optional, Tuple
+from uuid import UUID, uuid4
+import httpx
+from sqlalchemy import delete, insert, tuple_, update
+from sqlmodel import select
+from sqlalchemy.orm import selectinload
 from sqlmodel.ext.asyncio.session import AsyncSession
-from app.models.core import User
+from app.models.core import CartItem, Order, OrderItem
+from app.models.order import OrderResponse, OrderItemResponse
+from app.models.user import UserResponse
 from app.services.cart_service import cart_service
+from app.services.reservation_service import reservation_service
 from app.services.whatsapp_service import whatsapp_service
 from app.core.config import settings
-from app.core.exceptions import EssenciaRabeException, OutOfStockError
+from app.core.enums import OrderStatus
+from app.core.idempotency import checkout_results
+from app.core.jobs import job_queue
+from app.db.database import async_session_maker
+from app.core.pagination import encode_cursor, decode_cursor
+from app.core.exceptions import (
+    EssenciaRabeException, EntityNotFoundError, InvalidCursorError, InvalidOrderStateError, InvalidQuantityError,
+    PermissionDeniedError
+)
+
+logger = logging.getLogger(__name__)
+
+HISTORY_SORT = "created_at"
 
 class OrderService:
     @staticmethod
-    async def prepare_checkout(db: AsyncSession, user: User) -> dict:
-        cart = await cart_service.get_or_create_cart(db, user.id)
-        if not cart.items:
+    async def prepare_checkout(db: AsyncSession, user: UserResponse) -> dict:
+        """Turn the cart into a pending order in one transaction.
+
+        The order row, its stock reservations (one conditional UPDATE for
+        the whole cart), a bulk insert of the order items and the removal
+        of the checked-out cart items commit together or not at all.
+        """
+        cart = await cart_service.get_cart(db, user.id)
+        if not cart or not cart.items:
             raise EssenciaRabeException("Cart is empty", status_code=400)
-        
-        items_with_products = []
+        # Lines written before quantities were validated must not price an order
         for item in cart.items:
-            product = item.product
-            
-            if product.stock_quantity < item.quantity:
-                raise OutOfStockError(product.name, item.quantity, product.stock_quantity)
-                
-            items_with_products.append((product, item))
+            if item.quantity <= 0:
+                raise InvalidQuantityError(item.quantity)
+
+        total_amount, _ = cart_service.calculate_total(cart)
+        now = datetime.utcnow()
+        order_id = uuid4()
+        await db.execute(insert(Order).values(
+            id=order_id, user_id=user.id, total_amount=total_amount, status=OrderStatus.PENDING,
+            whatsapp_message_sent=False, created_at=now, updated_at=now
+        ))
+
+        quantities = {}
+        for item in cart.items:
+            quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
+        await reservation_service.reserve(db, user.id, quantities, order_id=order_id)
+
+        await db.execute(insert(OrderItem), [
+            {
+                "id": uuid4(),
+                "order_id": order_id,
+                "product_id": item.product_id,
+                "quantity": item.quantity,
+                "price_at_purchase": item.price_at_addition,
+            }
+            for item in cart.items
+        ])
+        # Only the items read above: anything added meanwhile stays in the cart.
+        # Fewer rows means a concurrent checkout already took them.
+        result = await db.execute(
+            delete(CartItem)
+            .where(CartItem.id.in_([item.id for item in cart.items]))
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount != len(cart.items):
+            await db.rollback()
+            raise EssenciaRabeException("Cart changed during checkout, please retry", status_code=409)
+        await db.commit()
+        await cart_service.invalidate(user.id)
+        if settings.SHOP_NOTIFY_WEBHOOK_URL:
+            await job_queue.enqueue("order.placed", {"order_id": str(order_id)})
+
+        items_with_products = [(item.product, item) for item in cart.items]
         
         header = whatsapp_service.generate_checkout_message(cart, user.username)
         body = whatsapp_service.format_order_summary(items_with_products)
-        footer = f"\n\nQuedo atento a tus indicaciones de pago. ¡Gracias! ✨"
+        footer = f"\n\n🧾 *Pedido:* {order_id.hex[:8].upper()}"
+        footer += f"\n\nQuedo atento a tus indicaciones de pago. ¡Gracias! ✨"
         
         full_message = header + body + footer
         whatsapp_link = whatsapp_service.generate_whatsapp_link(
@@ -33,8 +98,170 @@ class OrderService:
         
         return {
             "message": "Checkout prepared",
+            "order_id": str(order_id),
             "whatsapp_text": full_message,
             "whatsapp_link": whatsapp_link
         }
 
+    async def on_order_placed(self, payload: dict) -> None:
+        """Job handler: POST a placed order to SHOP_NOTIFY_WEBHOOK_URL.
+
+        Delivery is at least once, so the receiver should dedupe on the
+        order id; an error response raises and the queue retries it.
+        """
+        order_id = UUID(payload["order_id"])
+        async with async_session_maker() as db:
+            result = await db.execute(
+                select(Order)
+                .where(Order.id == order_id)
+                .options(selectinload(Order.items).selectinload(OrderItem.product))
+            )
+            order = result.scalar_one_or_none()
+            if order is None:
+                logger.warning(f"Order {order_id} no longer exists; shop not notified")
+                return
+            body = {"event": "order.placed", "order": self.to_response(order).model_dump(mode="json")}
+        async with httpx.AsyncClient(timeout=settings.SHOP_NOTIFY_TIMEOUT_SECONDS) as client:
+            response = await client.post(settings.SHOP_NOTIFY_WEBHOOK_URL, json=body)
+            response.raise_for_status()
+        logger.info(f"Shop notified of order {order_id}")
+
+    async def checkout(self, user: UserResponse, idempotency_key: Optional[str] = None) -> dict:
+        """prepare_checkout, deduplicated by Idempotency-Key and cart fingerprint.
+
+        A retry with the same key against the same cart gets the stored
+        result; concurrent duplicates share one computation. The fingerprint
+        is read from the database, so every worker sees the same cart
+        state. The result is also stored under the fingerprint the checkout
+        itself left behind, so retries still match once the cart has been
+        emptied. Without a key the fingerprint alone identifies the
+        checkout, which absorbs double taps.
+        """
+        scope = f"{user.id}:{idempotency_key or ''}"
+        async with async_session_maker() as db:
+            before = await cart_service.fingerprint(db, user.id)
+
+        async def compute():
+            # Own session: the shared computation must outlive a cancelled caller
+            async with async_session_maker() as db:
+                result = await self.prepare_checkout(db, user)
+                after = await cart_service.fingerprint(db, user.id)
+            return result, [f"{scope}:{after}"]
+
+        return await checkout_results.run(f"{scope}:{before}", compute)
+
+    @staticmethod
+    def to_response(order: Order) -> OrderResponse:
+        return OrderResponse(
+            id=order.id,
+            user_id=order.user_id,
+            status=order.status,
+            total_amount=order.total_amount,
+            whatsapp_message_sent=order.whatsapp_message_sent,
+            created_at=order.created_at,
+            items=[
+                OrderItemResponse(
+                    id=item.id,
+                    product_id=item.product_id,
+                    name=item.product.name,
+                    brand=item.product.brand,
+                    quantity=item.quantity,
+                    price_at_purchase=item.price_at_purchase,
+                    subtotal=item.quantity * item.price_at_purchase
+                )
+                for item in order.items
+            ]
+        )
+
+    async def list_orders(
+        self,
+        db: AsyncSession,
+        user: UserResponse,
+        limit: int = settings.DEFAULT_PAGE_SIZE,
+        cursor: Optional[str] = None,
+        all_users: bool = False
+    ) -> Tuple[List[OrderResponse], Optional[str]]:
+        """Order history, newest first, paged by keyset on (created_at, id).
+
+        Items and their products are loaded with two IN queries per page,
+        whatever the page size. `all_users` is reserved for admins.
+        """
+        if all_users and not user.is_admin:
+            raise PermissionDeniedError()
+        limit = min(limit, settings.MAX_PAGE_SIZE)
+
+        statement = (
+            select(Order)
+            .options(selectinload(Order.items).selectinload(OrderItem.product))
+            .order_by(Order.created_at.desc(), Order.id.desc())
+            .limit(limit + 1)
+        )
+        if not all_users:
+            statement = statement.where(Order.user_id == user.id)
+        if cursor:
+            try:
+                last_created, last_id = decode_cursor(cursor, HISTORY_SORT)
+                last_created, last_id = datetime.fromisoformat(last_created), UUID(last_id)
+            except (TypeError, ValueError):
+                raise InvalidCursorError()
+            statement = statement.where(tuple_(Order.created_at, Order.id) < tuple_(last_created, last_id))
+
+        orders = (await db.execute(statement)).scalars().all()
+        next_cursor = None
+        if len(orders) > limit:
+            orders = orders[:limit]
+            last = orders[-1]
+            next_cursor = encode_cursor(HISTORY_SORT, last.created_at.isoformat(), str(last.id))
+        return [self.to_response(order) for order in orders], next_cursor
+
+    @staticmethod
+    async def _set_status(db: AsyncSession, order_id: UUID, status: OrderStatus, user_id: UUID = None):
+        """Move a pending order to `status`; user_id restricts it to the owner"""
+        conditions = [Order.id == order_id, Order.status == OrderStatus.PENDING]
+        if user_id is not None:
+            conditions.append(Order.user_id == user_id)
+        statement = (
+            update(Order)
+            .where(*conditions)
+            .values(status=status, updated_at=datetime.utcnow())
+            .returning(Order.id)
+            .execution_options(synchronize_session=False)
+        )
+        return (await db.execute(statement)).first()
+
+    @staticmethod
+    async def _explain_failed_transition(db: AsyncSession, order_id: UUID, user_id: UUID = None):
+        result = await db.execute(select(Order.user_id, Order.status).where(Order.id == order_id))
+        order = result.first()
+        if order is None:
+            raise EntityNotFoundError("Order", order_id)
+        if user_id is not None and order.user_id != user_id:
+            raise PermissionDeniedError("Not authorized to modify this order")
+        if order.status != OrderStatus.PENDING:
+            raise InvalidOrderStateError(f"Order is already {order.status.value}")
+        raise InvalidOrderStateError("Order has no stock reserved")
+
+    async def confirm(self, db: AsyncSession, order_id: UUID) -> None:
+        """Keep the reserved stock for good and mark the order confirmed.
+
+        Reservations are claimed before the order row is touched, the same
+        order the sweeper uses, so the two cannot deadlock; if the sweeper
+        got them first the order is already cancelled.
+        """
+        consumed = await reservation_service.consume_for_order(db, order_id)
+        if not consumed or await self._set_status(db, order_id, OrderStatus.CONFIRMED) is None:
+            await db.rollback()
+            await self._explain_failed_transition(db, order_id)
+        await db.commit()
+
+    async def cancel(self, db: AsyncSession, order_id: UUID, user: UserResponse) -> None:
+        """Cancel a pending order and put its reserved stock back; owners or admins only"""
+        owner_id = None if user.is_admin else user.id
+        await reservation_service.release_for_order(db, order_id)
+        if await self._set_status(db, order_id, OrderStatus.CANCELLED, owner_id) is None:
+            await db.rollback()
+            await self._explain_failed_transition(db, order_id, owner_id)
+        await db.commit()
+
 order_service = OrderService()
+job_queue.register("order.placed", order_service.on_order_placed)
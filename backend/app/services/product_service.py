@@ -1,14 +1,72 @@
-from typing import List, Optional
-from uuid import UUID
+import asyncio
+import hashlib
+import logging
+from typing import Any, AsyncIterable, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+from uuid import UUID, uuid4
 import os
-from sqlmodel import select, or_, and_
+from pydantic import TypeAdapter
+from sqlalchemy import String, case, cast, func, literal, literal_column, true, tuple_, union_all
+from sqlalchemy.sql.elements import ColumnElement
+from sqlmodel import select, and_
 from sqlmodel.ext.asyncio.session import AsyncSession
-from app.models.core import Product, ProductType
-from app.core.exceptions import ProductNotFoundError
-import csv
-import io
+from app.models.core import Product, ProductType, CatalogSync
+from app.models.product import ProductResponse, ProductPage, ProductFacets
+from app.core.cache import catalog_cache
+from app.core.jobs import job_queue
+from app.core.config import settings
+from app.core.enums import ProductSort
+from app.core.exceptions import ProductNotFoundError, InvalidCursorError, InvalidFieldSelectionError
+from app.core.pagination import encode_cursor, decode_cursor
+from app.core.streaming import iter_csv_rows, iter_file_chunks
+from app.db.database import dialect_insert, advisory_lock, async_session_maker
+from app.services.search_service import search_service, normalize_text
+import json
 from datetime import datetime
 
+logger = logging.getLogger(__name__)
+
+CATALOG_CSV_PATH = "perfumes.csv"
+CATALOG_SYNC_LOCK_KEY = 727_001
+
+SORT_COLUMNS = {
+    ProductSort.NAME: Product.name,
+    ProductSort.PRICE: Product.price,
+}
+# JSON types a cursor may carry for each sort column
+SORT_CURSOR_TYPES = {
+    ProductSort.NAME: (str,),
+    ProductSort.PRICE: (int, float),
+}
+
+CSV_COLUMN_MAPPING = {
+    "Nombre": "name",
+    "Marca": "brand",
+    "Tipo": "type",
+    "ML": "size_ml",
+    "Precio": "price",
+    "Stock": "stock_quantity",
+    "Descripcion": "description",
+    "Familia Olfativa": "fragrance_family",
+    "Notas Salida": "notes_top",
+    "Notas Corazon": "notes_heart",
+    "Notas Fondo": "notes_base"
+}
+
+# Columns overwritten when an imported row matches an existing (name, brand, type)
+UPSERT_COLUMNS = [
+    "size_ml", "price", "stock_quantity", "description", "fragrance_family",
+    "notes_top", "notes_heart", "notes_base", "updated_at"
+]
+
+IMPORT_CHUNK_SIZE = 500
+
+# Fields a listing can be narrowed to with ?fields=; id is always returned
+PRODUCT_FIELDS = list(ProductResponse.model_fields)
+_SPARSE_ROWS = TypeAdapter(List[Dict[str, Any]])
+
+# Lower bounds of the price facet buckets; the last bucket is open-ended
+PRICE_BUCKET_BOUNDS = [0, 10000, 25000, 50000, 100000, 200000]
+
 class ProductService:
     @staticmethod
     async def get_by_id(db: AsyncSession, product_id: UUID) -> Product:
@@ -17,126 +75,515 @@ class ProductService:
             raise ProductNotFoundError(product_id)
         return product
 
-    async def list_products(
+    @staticmethod
+    async def with_live_stock(db: AsyncSession, items: List[dict]) -> List[dict]:
+        """Copies of cached product dicts carrying stock_quantity read from the database.
+
+        Stock moves with every checkout, so it is never served from the
+        catalog cache (nor versioned into its ETags); one primary-key read
+        per response keeps it current.
+        """
+        ids = [UUID(item["id"]) for item in items if "stock_quantity" in item]
+        if not ids:
+            return items
+        result = await db.execute(select(Product.id, Product.stock_quantity).where(Product.id.in_(ids)))
+        stock = {str(product_id): quantity for product_id, quantity in result.all()}
+        return [
+            {**item, "stock_quantity": stock.get(item["id"], item["stock_quantity"])}
+            if "stock_quantity" in item else item
+            for item in items
+        ]
+
+    async def get_by_id_cached(self, db: AsyncSession, product_id: UUID) -> dict:
+        """Catalog read of a single product served from the two-tier cache.
+
+        Stock checks keep using get_by_id so they always see the database row.
+        """
+        key = f"product:{product_id}"
+        cached = await catalog_cache.get(key)
+        if cached is not None:
+            return (await self.with_live_stock(db, [cached]))[0]
+
+        product = await self.get_by_id(db, product_id)
+        data = ProductResponse.model_validate(product).model_dump(mode="json")
+        await catalog_cache.set(key, data)
+        return data
+
+    async def get_many_cached(self, db: AsyncSession, product_ids: Sequence[UUID]) -> dict:
+        """Resolve several products through the cache with one IN query for the misses.
+
+        Items keep the request order; unknown ids are reported in `missing`.
+        """
+        product_ids = list(dict.fromkeys(product_ids))
+        keys = {product_id: f"product:{product_id}" for product_id in product_ids}
+        found = await catalog_cache.get_many(keys.values())
+        found = dict(zip(found, await self.with_live_stock(db, list(found.values()))))
+
+        misses = [product_id for product_id, key in keys.items() if key not in found]
+        if misses:
+            result = await db.execute(select(Product).where(Product.id.in_(misses)))
+            loaded = {
+                keys[product.id]: ProductResponse.model_validate(product).model_dump(mode="json")
+                for product in result.scalars().all()
+            }
+            await catalog_cache.set_many(loaded)
+            found.update(loaded)
+
+        return {
+            "items": [found[keys[pid]] for pid in product_ids if keys[pid] in found],
+            "missing": [pid for pid in product_ids if keys[pid] not in found],
+        }
+
+    @staticmethod
+    def listing_cache_key(prefix: str = "list", **filters) -> str:
+        """Normalize a filter combination so equivalent queries share one entry"""
+        normalized = {}
+        for name, value in filters.items():
+            if value is None or value is False or value == "":
+                continue
+            if name == "search":
+                value = " ".join(normalize_text(value).split())
+            elif name == "brand":
+                value = value.strip().casefold()
+            elif isinstance(value, (ProductType, ProductSort)):
+                value = value.value
+            elif name == "fields":
+                value = ",".join(sorted(value))
+            normalized[name] = value
+        return f"{prefix}:" + json.dumps(normalized, sort_keys=True, default=str)
+
+    @staticmethod
+    def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+        """Validate a comma-separated ?fields= value; None means every field"""
+        if not fields:
+            return None
+        selected = list(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+        unknown = [f for f in selected if f not in PRODUCT_FIELDS]
+        if unknown:
+            raise InvalidFieldSelectionError(unknown)
+        if "id" not in selected:
+            selected.insert(0, "id")
+        return selected
+
+    async def list_products_cached(
         self,
         db: AsyncSession,
         skip: int = 0,
-        limit: int = 100,
+        limit: int = settings.DEFAULT_PAGE_SIZE,
+        type: Optional[ProductType] = None,
+        brand: Optional[str] = None,
+        search: Optional[str] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        in_stock_only: bool = False,
+        sort: Optional[ProductSort] = None,
+        cursor: Optional[str] = None,
+        fields: Optional[Sequence[str]] = None
+    ) -> dict:
+        key = self.listing_cache_key(
+            skip=skip, limit=limit, type=type, brand=brand, search=search,
+            min_price=min_price, max_price=max_price, in_stock_only=in_stock_only,
+            sort=sort, cursor=cursor, fields=fields
+        )
+        cached = await catalog_cache.get(key)
+        if cached is not None:
+            items = await self.with_live_stock(db, cached["items"])
+            if in_stock_only:
+                # Sold out since the page was cached; restocked products show up once it expires
+                items = [item for item in items if item.get("stock_quantity", 1) > 0]
+            return {**cached, "items": items}
+
+        products, next_cursor = await self.list_products(
+            db, skip, limit, type, brand, search, min_price, max_price, in_stock_only, sort, cursor,
+            fields
+        )
+        if fields:
+            items = _SPARSE_ROWS.dump_python(
+                [{field: getattr(row, field) for field in fields} for row in products], mode="json"
+            )
+            page = {"items": items, "next_cursor": next_cursor}
+        else:
+            page = ProductPage(
+                items=[ProductResponse.model_validate(p) for p in products],
+                next_cursor=next_cursor
+            ).model_dump(mode="json")
+        await catalog_cache.set(key, page)
+        return page
+
+    @staticmethod
+    async def filter_conditions(
+        db: AsyncSession,
         type: Optional[ProductType] = None,
         brand: Optional[str] = None,
         search: Optional[str] = None,
         min_price: Optional[float] = None,
         max_price: Optional[float] = None,
         in_stock_only: bool = False
-    ) -> List[Product]:
-        statement = select(Product)
-        
+    ) -> Tuple[List, Optional[ColumnElement]]:
+        """WHERE conditions shared by listings and facets, plus the search rank"""
         conditions = []
+        rank = None
         if type:
             conditions.append(Product.type == type)
         if brand:
             conditions.append(Product.brand.ilike(f"%{brand}%"))
         if search:
-            conditions.append(
-                or_(
-                    Product.name.ilike(f"%{search}%"),
-                    Product.description.ilike(f"%{search}%"),
-                    Product.brand.ilike(f"%{search}%")
-                )
-            )
+            search_condition, rank = await search_service.build_filter(db, search)
+            conditions.append(search_condition)
         if min_price is not None:
             conditions.append(Product.price >= min_price)
         if max_price is not None:
             conditions.append(Product.price <= max_price)
         if in_stock_only:
             conditions.append(Product.stock_quantity > 0)
+        return conditions, rank
+
+    @staticmethod
+    def resolve_sort(sort: Optional[ProductSort], search: Optional[str]) -> ProductSort:
+        if sort is None:
+            sort = ProductSort.RELEVANCE if search else ProductSort.NAME
+        if sort == ProductSort.RELEVANCE and not search:
+            sort = ProductSort.NAME
+        return sort
+
+    async def list_statement(
+        self,
+        db: AsyncSession,
+        skip: int = 0,
+        limit: int = settings.DEFAULT_PAGE_SIZE,
+        type: Optional[ProductType] = None,
+        brand: Optional[str] = None,
+        search: Optional[str] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        in_stock_only: bool = False,
+        sort: Optional[ProductSort] = None,
+        cursor: Optional[str] = None,
+        fields: Optional[Sequence[str]] = None
+    ):
+        """SELECT behind list_products, fetching one extra row to detect a next page"""
+        limit = min(limit, settings.MAX_PAGE_SIZE)
+        sort = self.resolve_sort(sort, search)
+
+        if fields:
+            columns = dict.fromkeys(["id", *fields])
+            if sort != ProductSort.RELEVANCE:
+                columns[SORT_COLUMNS[sort].key] = None
+            statement = select(*(getattr(Product, name) for name in columns))
+        else:
+            statement = select(Product)
+        conditions, rank = await self.filter_conditions(
+            db, type, brand, search, min_price, max_price, in_stock_only
+        )
+
+        if sort == ProductSort.RELEVANCE:
+            if cursor:
+                raise InvalidCursorError("Cursor pagination is not available for relevance sort")
+            statement = statement.order_by(rank.desc(), Product.id).offset(skip)
+        else:
+            sort_column = SORT_COLUMNS[sort]
+            if cursor:
+                try:
+                    last_value, last_id = decode_cursor(cursor, sort.value)
+                    last_id = UUID(last_id)
+                except (TypeError, ValueError):
+                    raise InvalidCursorError()
+                if isinstance(last_value, bool) or not isinstance(last_value, SORT_CURSOR_TYPES[sort]):
+                    raise InvalidCursorError()
+                conditions.append(tuple_(sort_column, Product.id) > tuple_(last_value, last_id))
+            else:
+                statement = statement.offset(skip)
+            statement = statement.order_by(sort_column, Product.id)
         
         if conditions:
             statement = statement.where(and_(*conditions))
-            
-        statement = statement.offset(skip).limit(limit)
+        return statement.limit(limit + 1)
+
+    async def list_products(
+        self,
+        db: AsyncSession,
+        skip: int = 0,
+        limit: int = settings.DEFAULT_PAGE_SIZE,
+        type: Optional[ProductType] = None,
+        brand: Optional[str] = None,
+        search: Optional[str] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        in_stock_only: bool = False,
+        sort: Optional[ProductSort] = None,
+        cursor: Optional[str] = None,
+        fields: Optional[Sequence[str]] = None
+    ) -> Tuple[List[Product], Optional[str]]:
+        """List products ordered by a stable key.
+
+        Name/price sorts page by keyset: pass the returned cursor back to get
+        the next page in O(limit). Relevance sort (the default when searching)
+        pages by offset and never returns a cursor.
+
+        With `fields`, only those columns (plus id and the sort key) are
+        selected and rows are returned instead of Product instances.
+        """
+        limit = min(limit, settings.MAX_PAGE_SIZE)
+        sort = self.resolve_sort(sort, search)
+        statement = await self.list_statement(
+            db, skip, limit, type, brand, search, min_price, max_price, in_stock_only, sort, cursor,
+            fields
+        )
+        result = await db.execute(statement)
+        products = result.all() if fields else result.scalars().all()
+
+        next_cursor = None
+        if len(products) > limit:
+            products = products[:limit]
+            if sort != ProductSort.RELEVANCE:
+                last = products[-1]
+                next_cursor = encode_cursor(sort.value, getattr(last, SORT_COLUMNS[sort].key), str(last.id))
+        return products, next_cursor
+
+    async def get_facets(
+        self,
+        db: AsyncSession,
+        type: Optional[ProductType] = None,
+        brand: Optional[str] = None,
+        search: Optional[str] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        in_stock_only: bool = False
+    ) -> dict:
+        """Brand, type, family and price-range counts for the current selection.
+
+        All four facets come from one UNION ALL of GROUP BYs, so the whole
+        aggregation is a single round trip. Results are cached per filter set
+        and catalog version.
+        """
+        key = self.listing_cache_key(
+            "facets", type=type, brand=brand, search=search,
+            min_price=min_price, max_price=max_price, in_stock_only=in_stock_only
+        )
+        cached = await catalog_cache.get(key)
+        if cached is not None:
+            return cached
+
+        conditions, _ = await self.filter_conditions(
+            db, type, brand, search, min_price, max_price, in_stock_only
+        )
+        where = and_(*conditions) if conditions else true()
+
+        # Inline constants so the SELECT and GROUP BY render the same expression
+        bucket = case(
+            *[
+                (Product.price < literal_column(str(upper)), literal_column(str(index)))
+                for index, upper in enumerate(PRICE_BUCKET_BOUNDS[1:])
+            ],
+            else_=literal_column(str(len(PRICE_BUCKET_BOUNDS) - 1))
+        )
+        facet_columns = [
+            ("brands", Product.brand),
+            ("types", cast(Product.type, String)),
+            ("fragrance_families", Product.fragrance_family),
+            ("price_ranges", cast(bucket, String)),
+        ]
+        statement = union_all(*[
+            select(literal(facet).label("facet"), column.label("value"), func.count().label("count"))
+            .where(where)
+            .group_by(column)
+            for facet, column in facet_columns
+        ])
         result = await db.execute(statement)
-        return result.scalars().all()
 
-    async def sync_from_csv(self, db: AsyncSession) -> dict:
-        csv_path = "perfumes.csv"
-        if os.path.exists(csv_path):
-            with open(csv_path, "rb") as f:
-                content = f.read()
-                return await self.import_from_csv(db, content)
-        return {"message": "CSV file not found, no sync performed"}
+        facets = {facet: [] for facet, _ in facet_columns}
+        for facet, value, count in result.all():
+            if facet == "types":
+                value = ProductType[value].value
+            if facet == "price_ranges":
+                index = int(value)
+                upper = PRICE_BUCKET_BOUNDS[index + 1] if index + 1 < len(PRICE_BUCKET_BOUNDS) else None
+                facets[facet].append({"min_price": PRICE_BUCKET_BOUNDS[index], "max_price": upper, "count": count})
+            else:
+                facets[facet].append({"value": value, "count": count})
+
+        for facet, values in facets.items():
+            if facet == "price_ranges":
+                values.sort(key=lambda bucket: bucket["min_price"])
+            else:
+                values.sort(key=lambda item: (-item["count"], item["value"]))
 
+        data = ProductFacets(total=sum(b["count"] for b in facets["price_ranges"]), **facets).model_dump(mode="json")
+        await catalog_cache.set(key, data)
+        return data
 
     @staticmethod
-    async def import_from_csv(db: AsyncSession, file_content: bytes) -> dict:
-        content = file_content.decode("utf-8")
-        csv_file = io.StringIO(content)
-        reader = csv.DictReader(csv_file)
-        
-        column_mapping = {
-            "Nombre": "name",
-            "Marca": "brand",
-            "Tipo": "type",
-            "ML": "size_ml",
-            "Precio": "price",
-            "Stock": "stock_quantity",
-            "Descripcion": "description",
-            "Familia Olfativa": "fragrance_family",
-            "Notas Salida": "notes_top",
-            "Notas Corazon": "notes_heart",
-            "Notas Fondo": "notes_base"
+    def _hash_file(path: str) -> str:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    async def sync_from_csv(self, db: AsyncSession, csv_path: str = CATALOG_CSV_PATH, force: bool = False) -> dict:
+        """Import the catalog CSV unless its content hash matches the last applied one"""
+        if not os.path.exists(csv_path):
+            return {"message": "CSV file not found, no sync performed"}
+
+        content_hash = await asyncio.to_thread(self._hash_file, csv_path)
+        last_sync = await db.get(CatalogSync, csv_path)
+        if last_sync and last_sync.content_hash == content_hash and not force:
+            return {"message": "CSV unchanged, no sync performed"}
+
+        summary = await self.import_stream(db, iter_file_chunks(csv_path))
+        if summary["errors"]:
+            # Failed rows or chunks must be retried next time, so the file is not marked applied
+            logger.warning(f"Catalog sync had {len(summary['errors'])} errors; content hash not recorded")
+            return summary
+
+        statement = dialect_insert(db, CatalogSync).values(
+            source=csv_path, content_hash=content_hash, applied_at=datetime.utcnow()
+        )
+        statement = statement.on_conflict_do_update(
+            index_elements=["source"],
+            set_={"content_hash": statement.excluded.content_hash, "applied_at": statement.excluded.applied_at}
+        )
+        await db.execute(statement)
+        await db.commit()
+        return summary
+
+    async def sync_on_startup(self) -> None:
+        """Background startup sync; only the worker holding the lock runs it"""
+        try:
+            async with advisory_lock(CATALOG_SYNC_LOCK_KEY) as is_leader:
+                if not is_leader:
+                    logger.info("Catalog sync already running in another worker, skipping")
+                    return
+                async with async_session_maker() as db:
+                    summary = await self.sync_from_csv(db)
+                logger.info(f"Catalog sync finished: {summary}")
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Catalog sync on startup failed")
+
+    @staticmethod
+    def parse_csv_row(row: dict) -> Optional[dict]:
+        """Map a CSV row onto product columns; None for rows without name/brand"""
+        mapped_row = {CSV_COLUMN_MAPPING.get(k, k): v for k, v in row.items()}
+
+        name = mapped_row.get("name")
+        brand = mapped_row.get("brand")
+        if not name or not brand:
+            return None
+
+        return {
+            "name": str(name),
+            "brand": str(brand),
+            "type": ProductType((mapped_row.get("type") or ProductType.NONE.value).strip().lower()),
+            "size_ml": int(mapped_row.get("size_ml", 0)) if mapped_row.get("size_ml") else 0,
+            "price": float(mapped_row.get("price", 0)) if mapped_row.get("price") else 0.0,
+            "stock_quantity": int(mapped_row.get("stock_quantity", 0)) if mapped_row.get("stock_quantity") else 0,
+            "description": str(mapped_row.get("description", "")),
+            "fragrance_family": str(mapped_row.get("fragrance_family", "")),
+            "notes_top": str(mapped_row.get("notes_top", "")) if mapped_row.get("notes_top") else None,
+            "notes_heart": str(mapped_row.get("notes_heart", "")) if mapped_row.get("notes_heart") else None,
+            "notes_base": str(mapped_row.get("notes_base", "")) if mapped_row.get("notes_base") else None,
         }
 
-        summary = {"added": 0, "updated": 0, "errors": []}
+    @staticmethod
+    async def upsert_chunk(db: AsyncSession, rows: List[Tuple[int, dict]], summary: dict) -> None:
+        """Upsert one chunk of parsed rows with a single INSERT ... ON CONFLICT.
 
-        for index, row in enumerate(reader):
-            try:
-                mapped_row = {column_mapping.get(k, k): v for k, v in row.items()}
-                
-                name = mapped_row.get("name")
-                brand = mapped_row.get("brand")
-                
-                if not name or not brand:
-                    continue
-                
-                statement = select(Product).where(
-                    and_(
-                        Product.name == str(name),
-                        Product.brand == str(brand)
+        rows holds (csv line number, product data). A pre-select of the
+        chunk's keys keeps the added/updated split of the summary.
+        """
+        by_key: Dict[tuple, dict] = {}
+        for _, data in rows:
+            by_key[(data["name"], data["brand"], data["type"])] = data
+        # Repeated keys inside the chunk collapse into one row (last one wins)
+        duplicates = len(rows) - len(by_key)
+
+        now = datetime.utcnow()
+        values = [
+            {**data, "id": uuid4(), "is_active": True, "created_at": now, "updated_at": now}
+            for data in by_key.values()
+        ]
+        statement = dialect_insert(db, Product).values(values)
+        statement = statement.on_conflict_do_update(
+            index_elements=["name", "brand", "type"],
+            set_={column: statement.excluded[column] for column in UPSERT_COLUMNS}
+        )
+
+        try:
+            async with db.begin_nested():
+                result = await db.execute(
+                    select(Product.name, Product.brand, Product.type).where(
+                        tuple_(Product.name, Product.brand, Product.type).in_(list(by_key))
                     )
                 )
-                result = await db.execute(statement)
-                db_product = result.scalars().first()
-
-                product_data = {
-                    "name": str(name),
-                    "brand": str(brand),
-                    "type": mapped_row.get("type", ProductType.NONE),
-                    "size_ml": int(mapped_row.get("size_ml", 0)) if mapped_row.get("size_ml") else 0,
-                    "price": float(mapped_row.get("price", 0)) if mapped_row.get("price") else 0.0,
-                    "stock_quantity": int(mapped_row.get("stock_quantity", 0)) if mapped_row.get("stock_quantity") else 0,
-                    "description": str(mapped_row.get("description", "")),
-                    "fragrance_family": str(mapped_row.get("fragrance_family", "")),
-                    "notes_top": str(mapped_row.get("notes_top", "")) if mapped_row.get("notes_top") else None,
-                    "notes_heart": str(mapped_row.get("notes_heart", "")) if mapped_row.get("notes_heart") else None,
-                    "notes_base": str(mapped_row.get("notes_base", "")) if mapped_row.get("notes_base") else None,
-                    "updated_at": datetime.utcnow()
-                }
-
-                if db_product:
-                    for key, value in product_data.items():
-                        setattr(db_product, key, value)
-                    db.add(db_product)
-                    summary["updated"] += 1
-                else:
-                    new_product = Product(**product_data)
-                    db.add(new_product)
-                    summary["added"] += 1
+                existing = len(result.all())
+                await db.execute(statement)
+        except Exception as e:
+            for line, _ in rows:
+                summary["errors"].append(f"Error en fila {line}: {str(e)}")
+            return
 
+        summary["added"] += len(by_key) - existing
+        summary["updated"] += existing + duplicates
+
+    async def import_rows(
+        self,
+        db: AsyncSession,
+        rows: AsyncIterable[dict],
+        summary: dict,
+        on_chunk: Optional[Callable[[dict], Awaitable[None]]] = None
+    ) -> None:
+        """Parse and validate CSV rows, upserting and committing them in IMPORT_CHUNK_SIZE batches"""
+        chunk: List[Tuple[int, dict]] = []
+        line = 1
+        async for row in rows:
+            line += 1
+            try:
+                data = self.parse_csv_row(row)
             except Exception as e:
-                summary["errors"].append(f"Error en fila {index + 2}: {str(e)}")
+                summary["errors"].append(f"Error en fila {line}: {str(e)}")
+                continue
+            if data is None:
+                continue
 
-        await db.commit()
+            chunk.append((line, data))
+            if len(chunk) >= IMPORT_CHUNK_SIZE:
+                await self.upsert_chunk(db, chunk, summary)
+                await db.commit()
+                chunk = []
+                if on_chunk:
+                    await on_chunk(summary)
+
+        if chunk:
+            await self.upsert_chunk(db, chunk, summary)
+            await db.commit()
+            if on_chunk:
+                await on_chunk(summary)
+
+    async def import_stream(
+        self,
+        db: AsyncSession,
+        chunks: AsyncIterable[bytes],
+        summary: Optional[dict] = None,
+        on_chunk: Optional[Callable[[dict], Awaitable[None]]] = None
+    ) -> dict:
+        """Import a CSV byte stream with memory bounded by the chunk size"""
+        if summary is None:
+            summary = {"added": 0, "updated": 0, "errors": []}
+        started_at = datetime.utcnow()
+        try:
+            await self.import_rows(db, iter_csv_rows(chunks), summary, on_chunk)
+        finally:
+            version = await catalog_cache.bump_version()
+        # Every process holds its own similarity index: each patches it off the request
+        await job_queue.broadcast("catalog.refresh_similarity", {"since": started_at.isoformat(), "version": version})
         return summary
 
+    async def import_from_csv(self, db: AsyncSession, file_content: bytes) -> dict:
+        async def single_chunk():
+            yield file_content
+
+        return await self.import_stream(db, single_chunk())
+
 product_service = ProductService()
\ No newline at end of file
@@ -0,0 +1,198 @@
+import asyncio
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+from uuid import UUID, uuid4
+from sqlalchemy import case, delete, insert, update
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.core.config import settings
+from app.core.exceptions import InvalidQuantityError, OutOfStockError, ProductNotFoundError
+from app.db.database import async_session_maker
+from app.core.enums import OrderStatus
+from app.models.core import Order, Product, StockReservation
+
+logger = logging.getLogger(__name__)
+
+
+class ReservationService:
+    @staticmethod
+    def _per_product(quantities: Dict[UUID, int]):
+        """CASE product.id WHEN ... THEN quantity, for one-statement multi-row updates"""
+        return case(quantities, value=Product.id)
+
+    @staticmethod
+    def _locked(product_ids: Iterable[UUID]):
+        """Product ids locked FOR UPDATE in id order, the one order every stock write uses"""
+        return (
+            select(Product.id)
+            .where(Product.id.in_(list(product_ids)))
+            .order_by(Product.id)
+            .with_for_update()
+        )
+
+    @staticmethod
+    async def reserve(
+        db: AsyncSession,
+        user_id: UUID,
+        quantities: Dict[UUID, int],
+        ttl_seconds: int = None,
+        order_id: Optional[UUID] = None
+    ) -> List[UUID]:
+        """Take stock for every product in `quantities` or for none of them.
+
+        One conditional UPDATE decrements all rows that still have enough
+        stock; if it touched fewer rows than requested the caller's
+        transaction is rolled back and OutOfStockError raised. Row locks
+        are taken in id order (the FOR UPDATE subquery), so concurrent
+        multi-product reservations cannot deadlock, and nothing locks the
+        table. Runs in the caller's transaction; returns reservation ids.
+        """
+        for quantity in quantities.values():
+            if quantity <= 0:
+                raise InvalidQuantityError(quantity)
+        if not quantities:
+            return []
+        amount = ReservationService._per_product(quantities)
+        statement = (
+            update(Product)
+            .where(Product.id.in_(ReservationService._locked(quantities)), Product.stock_quantity >= amount)
+            .values(stock_quantity=Product.stock_quantity - amount)
+            .returning(Product.id)
+            .execution_options(synchronize_session=False)
+        )
+        reserved = (await db.execute(statement)).scalars().all()
+        if len(reserved) < len(quantities):
+            await db.rollback()
+            await ReservationService._explain_shortage(db, quantities)
+
+        expires_at = datetime.utcnow() + timedelta(seconds=ttl_seconds or settings.RESERVATION_TTL_SECONDS)
+        rows = [
+            {
+                "id": uuid4(),
+                "user_id": user_id,
+                "order_id": order_id,
+                "product_id": product_id,
+                "quantity": quantity,
+                "expires_at": expires_at,
+                "created_at": datetime.utcnow(),
+            }
+            for product_id, quantity in quantities.items()
+        ]
+        await db.execute(insert(StockReservation), rows)
+        return [row["id"] for row in rows]
+
+    @staticmethod
+    async def _explain_shortage(db: AsyncSession, quantities: Dict[UUID, int]) -> None:
+        result = await db.execute(
+            select(Product.id, Product.name, Product.stock_quantity).where(Product.id.in_(list(quantities)))
+        )
+        products = {row.id: row for row in result.all()}
+        for product_id, quantity in quantities.items():
+            product = products.get(product_id)
+            if product is None:
+                raise ProductNotFoundError(product_id)
+            if product.stock_quantity < quantity:
+                raise OutOfStockError(product.name, quantity, product.stock_quantity)
+        # Stock was restored between the UPDATE and this read; report the first product
+        product_id, quantity = next(iter(quantities.items()))
+        raise OutOfStockError(products[product_id].name, quantity, products[product_id].stock_quantity)
+
+    @staticmethod
+    async def _restock(db: AsyncSession, released: Iterable) -> int:
+        """Put released (product_id, quantity) rows back into stock in one UPDATE.
+
+        Locks in the same id order as reserve(), so a restock and a
+        reservation over the same products cannot deadlock.
+        """
+        totals: Dict[UUID, int] = defaultdict(int)
+        for row in released:
+            totals[row.product_id] += row.quantity
+        if totals:
+            amount = ReservationService._per_product(dict(totals))
+            await db.execute(
+                update(Product)
+                .where(Product.id.in_(ReservationService._locked(totals)))
+                .values(stock_quantity=Product.stock_quantity + amount)
+                .execution_options(synchronize_session=False)
+            )
+        return sum(totals.values())
+
+    @staticmethod
+    async def _release(db: AsyncSession, condition) -> List:
+        statement = (
+            delete(StockReservation)
+            .where(condition)
+            .returning(StockReservation.product_id, StockReservation.quantity, StockReservation.order_id)
+            .execution_options(synchronize_session=False)
+        )
+        released = (await db.execute(statement)).all()
+        await ReservationService._restock(db, released)
+        return released
+
+    @staticmethod
+    async def release_for_user(db: AsyncSession, user_id: UUID) -> int:
+        """Return every unit the user holds to stock (caller commits)"""
+        released = await ReservationService._release(db, StockReservation.user_id == user_id)
+        return sum(row.quantity for row in released)
+
+    @staticmethod
+    async def release_for_order(db: AsyncSession, order_id: UUID) -> int:
+        """Return an order's held units to stock (caller commits)"""
+        released = await ReservationService._release(db, StockReservation.order_id == order_id)
+        return sum(row.quantity for row in released)
+
+    @staticmethod
+    async def consume_for_order(db: AsyncSession, order_id: UUID) -> int:
+        """Drop an order's reservations keeping the stock taken; returns rows consumed.
+
+        Deleting the rows also claims them: a sweeper that already took them
+        makes this return 0, and SKIP LOCKED keeps it off rows claimed here.
+        """
+        statement = (
+            delete(StockReservation)
+            .where(StockReservation.order_id == order_id)
+            .returning(StockReservation.id)
+            .execution_options(synchronize_session=False)
+        )
+        return len((await db.execute(statement)).all())
+
+    @staticmethod
+    async def release_expired(db: AsyncSession, now: datetime = None) -> int:
+        """Delete one batch of expired reservations, restock their units and
+        cancel the orders still pending on them.
+
+        DELETE ... RETURNING hands each expired row to exactly one sweeper,
+        and SKIP LOCKED lets sweepers on other workers take other rows.
+        """
+        expired = (
+            select(StockReservation.id)
+            .where(StockReservation.expires_at <= (now or datetime.utcnow()))
+            .limit(settings.RESERVATION_SWEEP_BATCH_SIZE)
+            .with_for_update(skip_locked=True)
+        )
+        released = await ReservationService._release(db, StockReservation.id.in_(expired))
+        order_ids = {row.order_id for row in released if row.order_id is not None}
+        if order_ids:
+            await db.execute(
+                update(Order)
+                .where(Order.id.in_(order_ids), Order.status == OrderStatus.PENDING)
+                .values(status=OrderStatus.CANCELLED, updated_at=datetime.utcnow())
+                .execution_options(synchronize_session=False)
+            )
+        await db.commit()
+        return sum(row.quantity for row in released)
+
+    async def run_sweeper(self) -> None:
+        """Background loop releasing expired reservations until cancelled"""
+        while True:
+            await asyncio.sleep(settings.RESERVATION_SWEEP_INTERVAL_SECONDS)
+            try:
+                async with async_session_maker() as db:
+                    while units := await self.release_expired(db):
+                        logger.info(f"Released {units} reserved units back to stock")
+            except Exception as e:
+                logger.error(f"Reservation sweep failed: {e}")
+
+reservation_service = ReservationService()
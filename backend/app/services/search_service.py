@@ -0,0 +1,153 @@
+import re
+import unicodedata
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID
+from sqlalchemy import case, false, func, literal, literal_column, or_
+from sqlalchemy.sql.elements import ColumnElement
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.core.cache import catalog_cache
+from app.db.search import SEARCH_CONFIG
+from app.models.core import Product
+
+# Column weights for the in-process index, mirroring the A/B/C weights of
+# product_search_document() on PostgreSQL.
+FIELD_WEIGHTS = {
+    "name": 3.0,
+    "brand": 3.0,
+    "fragrance_family": 2.0,
+    "notes_top": 2.0,
+    "notes_heart": 2.0,
+    "notes_base": 2.0,
+    "description": 1.0,
+}
+
+# Upper bound of ids the fallback index hands back to SQL as an IN list
+FALLBACK_MAX_MATCHES = 1000
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+def normalize_text(value: Optional[str]) -> str:
+    """Lowercase and strip accents ("Limón" -> "limon")"""
+    if not value:
+        return ""
+    decomposed = unicodedata.normalize("NFKD", value)
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch)).casefold()
+
+def tokenize(value: Optional[str]) -> List[str]:
+    return _TOKEN_RE.findall(normalize_text(value))
+
+
+class InMemorySearchIndex:
+    """Inverted index over the catalog used when the database has no full-text support"""
+
+    def __init__(self):
+        self._postings: Dict[str, Dict[UUID, float]] = {}
+        self._terms: List[str] = []
+        self.is_built = False
+        self.version: Optional[int] = None
+
+    def build(self, rows, version: Optional[int] = None) -> None:
+        postings: Dict[str, Dict[UUID, float]] = defaultdict(dict)
+        for row in rows:
+            for field, weight in FIELD_WEIGHTS.items():
+                for token in tokenize(getattr(row, field)):
+                    scores = postings[token]
+                    scores[row.id] = scores.get(row.id, 0.0) + weight
+        self._postings = dict(postings)
+        self._terms = sorted(self._postings)
+        self.is_built = True
+        self.version = version
+
+    def invalidate(self) -> None:
+        self.is_built = False
+
+    def _prefix_matches(self, prefix: str) -> Dict[UUID, float]:
+        matches: Dict[UUID, float] = {}
+        start = bisect_left(self._terms, prefix)
+        for term in self._terms[start:]:
+            if not term.startswith(prefix):
+                break
+            for product_id, score in self._postings[term].items():
+                matches[product_id] = max(matches.get(product_id, 0.0), score)
+        return matches
+
+    def search(self, query: str, limit: int = FALLBACK_MAX_MATCHES) -> Dict[UUID, float]:
+        """Every query token must prefix-match some indexed token (AND semantics)"""
+        tokens = tokenize(query)
+        if not tokens:
+            return {}
+
+        scores: Optional[Dict[UUID, float]] = None
+        for token in tokens:
+            matches = self._prefix_matches(token)
+            if scores is None:
+                scores = matches
+            else:
+                scores = {pid: scores[pid] + s for pid, s in matches.items() if pid in scores}
+            if not scores:
+                return {}
+
+        best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+        return dict(best)
+
+
+class SearchService:
+    def __init__(self):
+        self.fallback_index = InMemorySearchIndex()
+
+    @staticmethod
+    def _dialect(db: AsyncSession) -> str:
+        return db.get_bind().dialect.name
+
+    @staticmethod
+    def to_tsquery_text(search: str) -> str:
+        """Prefix query so every keystroke matches ("lim" -> "lim:*")"""
+        return " & ".join(f"{token}:*" for token in tokenize(search))
+
+    def invalidate(self) -> None:
+        self.fallback_index.invalidate()
+
+    async def _ensure_fallback_index(self, db: AsyncSession) -> InMemorySearchIndex:
+        """Rebuild the in-process index whenever the catalog version moves"""
+        version = await catalog_cache.version()
+        if not self.fallback_index.is_built or self.fallback_index.version != version:
+            columns = [getattr(Product, field) for field in FIELD_WEIGHTS]
+            result = await db.execute(select(Product.id, *columns))
+            self.fallback_index.build(result.all(), version)
+        return self.fallback_index
+
+    async def build_filter(self, db: AsyncSession, search: str) -> Tuple[ColumnElement, ColumnElement]:
+        """Return the WHERE condition and relevance expression for a catalog search"""
+        if self._dialect(db) == "postgresql":
+            return self._postgres_filter(search)
+
+        index = await self._ensure_fallback_index(db)
+        scores = index.search(search)
+        if not scores:
+            # Bound, not literal_column("0"): ORDER BY 0 would be read as a column position
+            return false(), literal(0.0)
+        rank = case(scores, value=Product.id, else_=0.0)
+        return Product.id.in_(list(scores)), rank
+
+    def _postgres_filter(self, search: str) -> Tuple[ColumnElement, ColumnElement]:
+        document = func.product_search_document(
+            Product.name, Product.brand, Product.description, Product.fragrance_family,
+            Product.notes_top, Product.notes_heart, Product.notes_base
+        )
+        label = func.product_search_label(Product.name, Product.brand)
+        needle = normalize_text(search).strip()
+        label_match = label.contains(needle, autoescape=True)
+
+        tsquery_text = self.to_tsquery_text(search)
+        if not tsquery_text:
+            return label_match, func.similarity(label, needle)
+
+        tsquery = func.to_tsquery(literal_column(f"'{SEARCH_CONFIG}'::regconfig"), tsquery_text)
+        condition = or_(document.op("@@")(tsquery), label_match)
+        rank = func.ts_rank_cd(document, tsquery) + func.similarity(label, needle)
+        return condition, rank
+
+search_service = SearchService()
@@ -0,0 +1,278 @@
+import asyncio
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+from uuid import UUID
+import numpy as np
+from scipy import sparse
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.core.cache import catalog_cache
+from app.core.jobs import job_queue
+from app.db.database import async_session_maker
+from app.core.exceptions import ProductNotFoundError
+from app.models.core import Product
+from app.services.search_service import normalize_text
+
+# Neighbors kept per product; more than the API returns so same-perfume
+# variants (sealed vs decant) can be filtered out at read time.
+TOP_K = 20
+# Similarity entries materialized per block (rows x candidate columns); the
+# number of rows per block is derived from it, bounding temporary memory
+BLOCK_ENTRIES = 4_000_000
+# Above this share of changed rows a full rebuild is cheaper than patching
+INCREMENTAL_MAX_RATIO = 0.25
+
+FEATURE_WEIGHTS = {
+    "family": 1.5,
+    "family_word": 0.5,
+    "notes_top": 1.0,
+    "notes_heart": 1.2,
+    "notes_base": 1.2,
+}
+
+SUMMARY_FIELDS = ("id", "name", "brand", "type", "price", "image_url")
+FEATURE_COLUMNS = (Product.fragrance_family, Product.notes_top, Product.notes_heart, Product.notes_base)
+
+
+def product_features(row) -> Dict[str, float]:
+    """Sparse feature vector of a product: normalized notes and fragrance family"""
+    features: Dict[str, float] = {}
+    family = " ".join(normalize_text(row.fragrance_family).split())
+    if family:
+        features[f"family:{family}"] = FEATURE_WEIGHTS["family"]
+        for word in family.split():
+            features[f"family_word:{word}"] = FEATURE_WEIGHTS["family_word"]
+
+    for layer in ("notes_top", "notes_heart", "notes_base"):
+        for note in (getattr(row, layer) or "").split(","):
+            note = " ".join(normalize_text(note).split())
+            if note:
+                # A note shared across layers still counts as the same note
+                key = f"note:{note}"
+                features[key] = max(features.get(key, 0.0), FEATURE_WEIGHTS[layer])
+    return features
+
+
+def block_rows(width: int) -> int:
+    """Rows per block so a block of `width` columns stays within BLOCK_ENTRIES"""
+    return max(1, BLOCK_ENTRIES // max(width, 1))
+
+
+class SimilarityIndex:
+    """Top-k cosine neighbor table over sparse product note vectors.
+
+    Each product is an L2-normalized sparse row (feature column -> weight),
+    assembled into a CSR matrix when neighbors are computed, so similarity
+    is a sparse dot product and stored memory follows the number of notes
+    rather than products x vocabulary. Only one block of similarities is
+    densified at a time, with rows per block sized from n. Neighbors are kept as (n, TOP_K)
+    position/score arrays padded with -1 / -inf.
+    """
+
+    def __init__(self, top_k: int = TOP_K):
+        self.top_k = top_k
+        self._reset()
+
+    def _reset(self) -> None:
+        top_k = self.top_k
+        self.version: Optional[int] = None
+        self.ids: List[UUID] = []
+        self.positions: Dict[UUID, int] = {}
+        self.summaries: List[dict] = []
+        self.vocabulary: Dict[str, int] = {}
+        self.vectors: List[Tuple[np.ndarray, np.ndarray]] = []
+        self.neighbors = np.zeros((0, top_k), dtype=np.int32)
+        self.scores = np.zeros((0, top_k), dtype=np.float32)
+
+    @property
+    def is_built(self) -> bool:
+        return self.version is not None
+
+    def _vectorize(self, features: Dict[str, float]) -> Tuple[np.ndarray, np.ndarray]:
+        for key in features:
+            if key not in self.vocabulary:
+                self.vocabulary[key] = len(self.vocabulary)
+        indices = np.fromiter((self.vocabulary[key] for key in features), dtype=np.int32, count=len(features))
+        data = np.fromiter(features.values(), dtype=np.float32, count=len(features))
+        norm = np.linalg.norm(data)
+        return indices, (data / norm if norm else data)
+
+    def _upsert_rows(self, rows: Sequence) -> np.ndarray:
+        """Store vectors for rows (appending new products); returns their positions"""
+        positions = []
+        for row in rows:
+            vector = self._vectorize(product_features(row))
+            summary = {field: getattr(row, field) for field in SUMMARY_FIELDS}
+            position = self.positions.get(row.id)
+            if position is None:
+                position = len(self.ids)
+                self.positions[row.id] = position
+                self.ids.append(row.id)
+                self.summaries.append(summary)
+                self.vectors.append(vector)
+            else:
+                self.summaries[position] = summary
+                self.vectors[position] = vector
+            positions.append(position)
+
+        added = len(self.ids) - len(self.neighbors)
+        if added:
+            self.neighbors = np.concatenate([self.neighbors, np.full((added, self.top_k), -1, dtype=np.int32)])
+            self.scores = np.concatenate([self.scores, np.full((added, self.top_k), -np.inf, dtype=np.float32)])
+        return np.asarray(positions, dtype=np.int64)
+
+    def _matrix(self) -> sparse.csr_matrix:
+        lengths = np.fromiter((len(indices) for indices, _ in self.vectors), dtype=np.int64, count=len(self.vectors))
+        indptr = np.concatenate([[0], np.cumsum(lengths)])
+        indices = np.concatenate([v[0] for v in self.vectors]) if self.vectors else np.zeros(0, dtype=np.int32)
+        data = np.concatenate([v[1] for v in self.vectors]) if self.vectors else np.zeros(0, dtype=np.float32)
+        return sparse.csr_matrix((data, indices, indptr), shape=(len(self.vectors), len(self.vocabulary)))
+
+    def _top_k(self, sims: np.ndarray, row_positions: np.ndarray):
+        """Top-k columns per row of a dense (rows, n) similarity block, excluding self.
+
+        The block is consumed: it is negated in place for argpartition.
+        """
+        sims[np.arange(len(row_positions)), row_positions] = -np.inf
+        np.negative(sims, out=sims)
+        n = sims.shape[1]
+        k = min(self.top_k, n)
+        neighbors = np.full((len(row_positions), self.top_k), -1, dtype=np.int32)
+        scores = np.full((len(row_positions), self.top_k), -np.inf, dtype=np.float32)
+        if k == 0:
+            return neighbors, scores
+        part = np.argpartition(sims, k - 1, axis=1)[:, :k]
+        part_scores = -np.take_along_axis(sims, part, axis=1)
+        order = np.argsort(-part_scores, axis=1, kind="stable")
+        neighbors[:, :k] = np.take_along_axis(part, order, axis=1)
+        scores[:, :k] = np.take_along_axis(part_scores, order, axis=1)
+        empty = scores <= 0
+        neighbors[empty], scores[empty] = -1, -np.inf
+        return neighbors, scores
+
+    def _recompute(self, positions: np.ndarray, matrix: sparse.csr_matrix) -> None:
+        transposed = matrix.T.tocsr()
+        step = block_rows(matrix.shape[0])
+        for start in range(0, len(positions), step):
+            block = positions[start:start + step]
+            sims = (matrix[block] @ transposed).toarray().astype(np.float32, copy=False)
+            self.neighbors[block], self.scores[block] = self._top_k(sims, block)
+
+    def build(self, rows: Sequence, version: int) -> None:
+        self._reset()
+        positions = self._upsert_rows(rows)
+        self._recompute(positions, self._matrix())
+        self.version = version
+
+    def update(self, rows: Sequence, version: int) -> None:
+        """Patch the neighbor table for changed or new rows.
+
+        Changed rows are recomputed. Rows that listed a changed product get
+        recomputed too, since its score may have dropped. Every other row
+        only merges the changed products in as candidates, block by block.
+        """
+        if not rows:
+            self.version = version
+            return
+        changed = self._upsert_rows(rows)
+        matrix = self._matrix()
+
+        stale = np.isin(self.neighbors, changed).any(axis=1)
+        stale[changed] = True
+        self._recompute(np.flatnonzero(stale), matrix)
+
+        others = np.flatnonzero(~stale)
+        changed_columns = matrix[changed].T.tocsr()
+        candidate_ids = changed.astype(np.int32)
+        step = block_rows(len(changed) + self.top_k)
+        for start in range(0, len(others), step):
+            block = others[start:start + step]
+            candidate_scores = (matrix[block] @ changed_columns).toarray().astype(np.float32, copy=False)
+            candidate_scores[candidate_scores <= 0] = -np.inf
+            merged_ids = np.concatenate(
+                [self.neighbors[block], np.broadcast_to(candidate_ids, candidate_scores.shape)], axis=1
+            )
+            merged_scores = np.concatenate([self.scores[block], candidate_scores], axis=1)
+            order = np.argsort(-merged_scores, axis=1, kind="stable")[:, :self.top_k]
+            scores = np.take_along_axis(merged_scores, order, axis=1)
+            neighbors = np.take_along_axis(merged_ids, order, axis=1)
+            neighbors[np.isneginf(scores)] = -1
+            self.neighbors[block], self.scores[block] = neighbors, scores
+        self.version = version
+
+    def similar(self, product_id: UUID, limit: int) -> Optional[List[dict]]:
+        position = self.positions.get(product_id)
+        if position is None:
+            return None
+        source = self.summaries[position]
+        results = []
+        for neighbor, score in zip(self.neighbors[position], self.scores[position]):
+            if neighbor < 0 or score <= 0:
+                break
+            candidate = self.summaries[neighbor]
+            if candidate["name"] == source["name"] and candidate["brand"] == source["brand"]:
+                continue
+            results.append({**candidate, "score": round(float(score), 4)})
+            if len(results) == limit:
+                break
+        return results
+
+
+class SimilarityService:
+    def __init__(self):
+        self.index = SimilarityIndex()
+        self._lock = asyncio.Lock()
+
+    @staticmethod
+    async def _load_rows(db: AsyncSession, since: Optional[datetime] = None):
+        columns = [getattr(Product, field) for field in SUMMARY_FIELDS]
+        statement = select(*columns, *FEATURE_COLUMNS)
+        if since is not None:
+            statement = statement.where(Product.updated_at >= since)
+        result = await db.execute(statement)
+        return result.all()
+
+    async def ensure_current(self, db: AsyncSession) -> SimilarityIndex:
+        """Full rebuild when the catalog version moved without us (other worker)"""
+        version = await catalog_cache.version()
+        if self.index.version == version:
+            return self.index
+        async with self._lock:
+            if self.index.version != version:
+                rows = await self._load_rows(db)
+                await asyncio.to_thread(self.index.build, rows, version)
+        return self.index
+
+    async def refresh_since(self, db: AsyncSession, since: datetime, version: int = None) -> None:
+        """Incrementally apply rows touched by an import that started at `since`.
+
+        Skipped when the index already reached `version` (ensure_current
+        rebuilt it first).
+        """
+        if not self.index.is_built:
+            return
+        version = version if version is not None else await catalog_cache.version()
+        async with self._lock:
+            if self.index.version >= version:
+                return
+            rows = await self._load_rows(db, since)
+            if len(rows) > INCREMENTAL_MAX_RATIO * max(len(self.index.ids), 1):
+                rows = await self._load_rows(db)
+                await asyncio.to_thread(self.index.build, rows, version)
+            else:
+                await asyncio.to_thread(self.index.update, rows, version)
+
+    async def refresh_job(self, payload: dict) -> None:
+        """Broadcast handler for refresh_since: every process patches its own index"""
+        async with async_session_maker() as db:
+            await self.refresh_since(db, datetime.fromisoformat(payload["since"]), payload.get("version"))
+
+    async def get_similar(self, db: AsyncSession, product_id: UUID, limit: int = 10) -> List[dict]:
+        index = await self.ensure_current(db)
+        results = index.similar(product_id, limit)
+        if results is None:
+            raise ProductNotFoundError(product_id)
+        return results
+
+similarity_service = SimilarityService()
+job_queue.register("catalog.refresh_similarity", similarity_service.refresh_job)
@@ -1,10 +1,26 @@
+import re
 from typing import Optional, List
 from uuid import UUID
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy import delete
 from sqlmodel import select
 from sqlmodel.ext.asyncio.session import AsyncSession
-from app.models.core import User
-from app.core.security import get_password_hash
-from app.core.exceptions import UserNotFoundError, DuplicateEntityError
+from app.models.core import User, Cart, CartItem, Order, OrderItem
+from app.core.security import get_password_hash_async
+from app.core.cache import principal_cache
+from app.core.revocation import revocation_store
+from app.services.reservation_service import reservation_service
+from app.core.enums import OrderStatus
+from app.core.exceptions import EssenciaRabeException, UserNotFoundError, DuplicateEntityError
+
+# Unique constraints on user, as PostgreSQL (index name) and SQLite (table.column) report them
+UNIQUE_USER_FIELDS = {
+    "ix_user_email": "email",
+    "user.email": "email",
+    "ix_user_username": "username",
+    "user.username": "username",
+}
+UNIQUE_VIOLATION = re.compile(r'unique constraint "([^"]+)"|UNIQUE constraint failed: (\S+)')
 
 class UserService:
     @staticmethod
@@ -27,36 +43,83 @@ class UserService:
         return result.scalar_one_or_none()
 
     @staticmethod
-    async def create(db: AsyncSession, user_data: dict) -> User:
-        if await UserService.get_by_email(db, user_data["email"]):
-            raise DuplicateEntityError("User", "email", user_data["email"])
-        if await UserService.get_by_username(db, user_data["username"]):
-            raise DuplicateEntityError("User", "username", user_data["username"])
+    def duplicate_field(error: IntegrityError) -> Optional[str]:
+        """Which unique user column an INSERT/UPDATE collided on, from the driver message.
+
+        None for any other integrity error.
+        """
+        match = UNIQUE_VIOLATION.search(str(error.orig))
+        if not match:
+            return None
+        return UNIQUE_USER_FIELDS.get(match.group(1) or match.group(2))
 
-        user_data["hashed_password"] = get_password_hash(user_data.pop("password"))
+    @staticmethod
+    async def create(db: AsyncSession, user_data: dict) -> User:
+        """Single INSERT; the unique indexes on email/username reject duplicates"""
+        user_data["hashed_password"] = await get_password_hash_async(user_data.pop("password"))
         db_user = User(**user_data)
         db.add(db_user)
-        await db.commit()
-        await db.refresh(db_user)
+        # Created with the account so cart endpoints never have to create it lazily
+        db.add(Cart(user_id=db_user.id))
+        try:
+            await db.commit()
+        except IntegrityError as e:
+            await db.rollback()
+            field = UserService.duplicate_field(e)
+            if field is None:
+                raise
+            raise DuplicateEntityError("User", field, user_data.get(field))
         return db_user
 
     @staticmethod
     async def update(db: AsyncSession, db_user: User, user_data: dict) -> User:
-        if "password" in user_data:
-            user_data["hashed_password"] = get_password_hash(user_data.pop("password"))
+        password_changed = "password" in user_data
+        if password_changed:
+            user_data["hashed_password"] = await get_password_hash_async(user_data.pop("password"))
         
         for key, value in user_data.items():
             setattr(db_user, key, value)
         
         db.add(db_user)
-        await db.commit()
+        try:
+            await db.commit()
+        except IntegrityError as e:
+            await db.rollback()
+            field = UserService.duplicate_field(e)
+            if field is None:
+                raise
+            raise DuplicateEntityError("User", field, user_data.get(field))
         await db.refresh(db_user)
+        await principal_cache.delete(str(db_user.id))
+        if password_changed:
+            await revocation_store.revoke_subject(str(db_user.id))
         return db_user
 
     @staticmethod
     async def delete(db: AsyncSession, db_user: User) -> None:
+        """Delete the account with its cart and unconfirmed orders.
+
+        Confirmed orders are sales records, so their owner cannot be deleted.
+        Reservations go first: with them gone no order can be confirmed
+        while this runs.
+        """
+        await reservation_service.release_for_user(db, db_user.id)
+        confirmed = await db.execute(
+            select(Order.id).where(Order.user_id == db_user.id, Order.status == OrderStatus.CONFIRMED).limit(1)
+        )
+        if confirmed.first() is not None:
+            await db.rollback()
+            raise EssenciaRabeException("Users with confirmed orders cannot be deleted", status_code=409)
+        user_cart = select(Cart.id).where(Cart.user_id == db_user.id)
+        await db.execute(delete(CartItem).where(CartItem.cart_id.in_(user_cart)))
+        await db.execute(delete(Cart).where(Cart.user_id == db_user.id))
+        user_orders = select(Order.id).where(Order.user_id == db_user.id)
+        await db.execute(delete(OrderItem).where(OrderItem.order_id.in_(user_orders)))
+        await db.execute(delete(Order).where(Order.user_id == db_user.id))
         await db.delete(db_user)
         await db.commit()
+        await principal_cache.delete(str(db_user.id))
+        await revocation_store.revoke_subject(str(db_user.id))
 
     @staticmethod
     async def get_multi(db: AsyncSession, skip: int = 0, limit: int = 100) -> List[User]:
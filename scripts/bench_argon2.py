@@ -0,0 +1,37 @@
+"""Argon2id latency per (memory_cost, time_cost) on this host.
+
+Prints the median hash time of each parameter pair and the cost that
+startup calibration would pick for the configured PASSWORD_HASH_TARGET_MS.
+
+    python scripts/bench_argon2.py --time-costs 1 2 3 4 --rounds 5
+"""
+import argparse
+from app.core.config import settings
+from app.core.password_cost import MEMORY_STEPS_KIB, calibrate, cost_table
+
+
+def main(time_costs, rounds: int, target_ms: int, max_memory_kib: int) -> None:
+    memory_steps = [m for m in MEMORY_STEPS_KIB if m <= max_memory_kib]
+    rows = cost_table(memory_steps, time_costs, rounds)
+
+    print(f"\n{'memory':>10}" + "".join(f"{f't={t}':>10}" for t in time_costs))
+    for memory_kib in memory_steps:
+        timings = {row["time_cost"]: row["ms"] for row in rows if row["memory_kib"] == memory_kib}
+        print(f"{memory_kib // 1024:>7}MiB" + "".join(f"{timings[t]:>8.1f}ms" for t in time_costs))
+
+    if target_ms > 0:
+        cost = calibrate(target_ms, max_memory_kib)
+        print(
+            f"\nCalibrated for {target_ms} ms: time_cost={cost.time_cost}, "
+            f"memory_cost={cost.memory_cost} KiB ({cost.memory_cost // 1024} MiB)"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--time-costs", type=int, nargs="+", default=[1, 2, 3, 4])
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--target-ms", type=int, default=settings.PASSWORD_HASH_TARGET_MS)
+    parser.add_argument("--max-memory-kib", type=int, default=settings.PASSWORD_HASH_MAX_MEMORY_KIB)
+    args = parser.parse_args()
+    main(args.time_costs, args.rounds, args.target_ms, args.max_memory_kib)
@@ -0,0 +1,141 @@
+"""Benchmark catalog search: legacy triple ILIKE scan vs the indexed search path.
+
+Seeds synthetic products into the configured DATABASE_URL, runs both search
+strategies and prints median / p95 latency per query, then removes the rows.
+
+    python scripts/bench_search.py --products 100000 --repeat 20
+"""
+import argparse
+import asyncio
+import logging
+import random
+import statistics
+import time
+from datetime import datetime
+from uuid import uuid4
+from sqlalchemy import delete, insert, text
+from sqlmodel import select, or_
+from app.db.database import init_db, async_session_maker
+from app.models.core import Product, ProductType
+from app.services.product_service import product_service
+from app.services.search_service import search_service
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+BENCH_BRAND_PREFIX = "Bench "
+NOTES = [
+    "Limón", "Bergamota", "Menta", "Pimienta Rosa", "Jengibre", "Jazmín", "Rosa", "Lavanda",
+    "Canela", "Vainilla", "Ámbar", "Almizcle", "Sándalo", "Cedro", "Vetiver", "Pachulí",
+    "Incienso", "Oud", "Cuero", "Tabaco", "Iris", "Neroli", "Mandarina", "Cardamomo",
+]
+FAMILIES = ["Amaderada", "Oriental", "Floral", "Cítrica", "Aromática Fougère", "Especiada", "Ahumada"]
+WORDS = ["Noir", "Intense", "Elixir", "Sauvage", "Bleu", "Royal", "Oud", "Night", "Gold", "Aqua", "Club"]
+QUERIES = ["limon", "Limón", "sauvage", "bench brand 42", "vainilla ambar", "oud", "lim"]
+
+
+def synthetic_products(count: int):
+    rng = random.Random(42)
+    now = datetime.utcnow()
+    for i in range(count):
+        notes = rng.sample(NOTES, 9)
+        yield {
+            "id": uuid4(),
+            "name": f"{rng.choice(WORDS)} {rng.choice(WORDS)} {i}",
+            "brand": f"{BENCH_BRAND_PREFIX}Brand {i % 500}",
+            "type": rng.choice([ProductType.SEALED, ProductType.DECANT]),
+            "size_ml": rng.choice([5, 50, 100]),
+            "price": float(rng.randrange(5000, 250000, 500)),
+            "stock_quantity": rng.randrange(0, 30),
+            "description": f"Fragancia {rng.choice(FAMILIES).lower()} con {notes[0].lower()} y {notes[1].lower()}.",
+            "fragrance_family": rng.choice(FAMILIES),
+            "notes_top": ", ".join(notes[0:3]),
+            "notes_heart": ", ".join(notes[3:6]),
+            "notes_base": ", ".join(notes[6:9]),
+            "is_active": True,
+            "created_at": now,
+            "updated_at": now,
+        }
+
+
+async def seed(count: int, chunk_size: int = 5000) -> None:
+    async with async_session_maker() as db:
+        batch = []
+        for row in synthetic_products(count):
+            batch.append(row)
+            if len(batch) == chunk_size:
+                await db.execute(insert(Product), batch)
+                batch = []
+        if batch:
+            await db.execute(insert(Product), batch)
+        await db.commit()
+        if db.get_bind().dialect.name == "postgresql":
+            await db.execute(text("ANALYZE product"))
+            await db.commit()
+
+
+async def legacy_search(db, search: str, limit: int):
+    statement = select(Product).where(
+        or_(
+            Product.name.ilike(f"%{search}%"),
+            Product.description.ilike(f"%{search}%"),
+            Product.brand.ilike(f"%{search}%")
+        )
+    ).limit(limit)
+    result = await db.execute(statement)
+    return result.scalars().all()
+
+
+async def indexed_search(db, search: str, limit: int):
+    products, _ = await product_service.list_products(db, limit=limit, search=search)
+    return products
+
+
+async def measure(strategy, search: str, repeat: int, limit: int):
+    timings = []
+    hits = 0
+    for _ in range(repeat):
+        async with async_session_maker() as db:
+            start = time.perf_counter()
+            rows = await strategy(db, search, limit)
+            timings.append((time.perf_counter() - start) * 1000)
+            hits = len(rows)
+    timings.sort()
+    p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+    return statistics.median(timings), p95, hits
+
+
+async def main(products: int, repeat: int, limit: int, keep: bool) -> None:
+    await init_db()
+    logger.info(f"Seeding {products} synthetic products...")
+    await seed(products)
+    try:
+        async with async_session_maker() as db:
+            start = time.perf_counter()
+            await search_service.build_filter(db, "warmup")
+            logger.info(f"Search warm-up took {(time.perf_counter() - start) * 1000:.1f} ms")
+
+        print(f"\n{'query':<18}{'ILIKE p50':>12}{'ILIKE p95':>12}{'index p50':>12}{'index p95':>12}{'hits':>8}")
+        for query in QUERIES:
+            legacy_p50, legacy_p95, _ = await measure(legacy_search, query, repeat, limit)
+            indexed_p50, indexed_p95, hits = await measure(indexed_search, query, repeat, limit)
+            print(
+                f"{query:<18}{legacy_p50:>10.2f}ms{legacy_p95:>10.2f}ms"
+                f"{indexed_p50:>10.2f}ms{indexed_p95:>10.2f}ms{hits:>8}"
+            )
+    finally:
+        if not keep:
+            async with async_session_maker() as db:
+                await db.execute(delete(Product).where(Product.brand.startswith(BENCH_BRAND_PREFIX)))
+                await db.commit()
+            search_service.invalidate()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--keep", action="store_true", help="Keep the synthetic rows after the run")
+    args = parser.parse_args()
+    asyncio.run(main(args.products, args.repeat, args.limit, args.keep))
@@ -0,0 +1,109 @@
+"""Query-plan regression check for the hot catalog listing shapes.
+
+Seeds synthetic products into the configured DATABASE_URL (PostgreSQL),
+runs EXPLAIN on the statements list_products actually generates and exits
+non-zero if any of them falls back to a sequential scan of product.
+
+    python scripts/check_query_plans.py --products 50000
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+from typing import Iterator, List
+from sqlalchemy import delete, text
+from sqlmodel import select
+from app.db.database import init_db, async_session_maker
+from app.models.core import Product, ProductType
+from app.core.enums import ProductSort
+from app.services.product_service import product_service
+
+# bench_search is a sibling script, not a package module: import it by its directory
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from bench_search import BENCH_BRAND_PREFIX, seed  # noqa: E402
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# list_products keyword arguments of the listings the storefront issues most
+HOT_LISTINGS = {
+    "default (name)": {},
+    "sort price": {"sort": ProductSort.PRICE},
+    "price range": {"min_price": 20000, "max_price": 40000, "sort": ProductSort.PRICE},
+    "type + sort price": {"type": ProductType.DECANT, "sort": ProductSort.PRICE},
+    "type + price range": {"type": ProductType.SEALED, "min_price": 20000, "max_price": 40000},
+    "in stock": {"in_stock_only": True},
+    "in stock + sort price": {"in_stock_only": True, "sort": ProductSort.PRICE},
+    "search": {"search": "vainilla"},
+}
+
+
+def plan_nodes(plan: dict) -> Iterator[dict]:
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from plan_nodes(child)
+
+
+async def explain(db, statement) -> List[dict]:
+    compiled = statement.compile(dialect=db.get_bind().dialect, compile_kwargs={"literal_binds": True})
+    result = await db.execute(text(f"EXPLAIN (FORMAT JSON) {compiled}"))
+    raw = result.scalar_one()
+    plan = (json.loads(raw) if isinstance(raw, str) else raw)[0]["Plan"]
+    return list(plan_nodes(plan))
+
+
+async def hot_statements(db):
+    for label, filters in HOT_LISTINGS.items():
+        yield label, await product_service.list_statement(db, **filters)
+
+        if not filters.get("search"):
+            # Second page through the keyset cursor
+            _, cursor = await product_service.list_products(db, **filters)
+            if cursor:
+                yield f"{label} (cursor)", await product_service.list_statement(db, cursor=cursor, **filters)
+
+    ids = (await db.execute(select(Product.id).limit(20))).scalars().all()
+    yield "batch by id", select(Product).where(Product.id.in_(ids))
+
+
+async def main(products: int, keep: bool) -> int:
+    await init_db()
+    async with async_session_maker() as db:
+        if db.get_bind().dialect.name != "postgresql":
+            logger.error("Query plans are only checked against PostgreSQL")
+            return 2
+
+    logger.info(f"Seeding {products} synthetic products...")
+    await seed(products)
+    failures = 0
+    try:
+        async with async_session_maker() as db:
+            print(f"\n{'query':<32}{'result':<10}indexes")
+            async for label, statement in hot_statements(db):
+                nodes = await explain(db, statement)
+                seq_scans = [
+                    n for n in nodes
+                    if n["Node Type"] == "Seq Scan" and n.get("Relation Name") == Product.__tablename__
+                ]
+                indexes = sorted({n["Index Name"] for n in nodes if "Index Name" in n})
+                failures += bool(seq_scans)
+                print(f"{label:<32}{'SEQ SCAN' if seq_scans else 'ok':<10}{', '.join(indexes) or '-'}")
+    finally:
+        if not keep:
+            async with async_session_maker() as db:
+                await db.execute(delete(Product).where(Product.brand.startswith(BENCH_BRAND_PREFIX)))
+                await db.commit()
+
+    if failures:
+        print(f"\n{failures} hot queries fall back to a sequential scan")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=50_000)
+    parser.add_argument("--keep", action="store_true", help="Keep the synthetic rows after the run")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main(args.products, args.keep)))
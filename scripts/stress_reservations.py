@@ -0,0 +1,144 @@
+"""Concurrency stress test for the stock reservation engine.
+
+Creates a few limited-stock products and many synthetic users, then fires
+concurrent whole-cart reservations (each cart holds every product, listed in
+random order) against the configured DATABASE_URL. Checks that exactly the
+available stock was sold, that no stock went negative, and that expiring the
+reservations restores the original stock. Prints p50 / p95 latency and exits
+non-zero on any violated invariant. Meant for PostgreSQL; SQLite serializes
+writers and is only useful as a smoke run with small numbers.
+
+    python scripts/stress_reservations.py --checkouts 500 --concurrency 100 --stock 40
+"""
+import argparse
+import asyncio
+import logging
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from uuid import uuid4
+from sqlalchemy import delete, insert
+from sqlmodel import select
+from app.core.exceptions import OutOfStockError
+from app.db.database import init_db, async_session_maker
+from app.models.core import Product, ProductType, StockReservation, User
+from app.services.reservation_service import reservation_service
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+STRESS_BRAND = "Stress Reservations"
+
+
+async def seed(products: int, stock: int, users: int):
+    now = datetime.utcnow()
+    product_rows = [
+        {
+            "id": uuid4(), "name": f"Stress Perfume {i}", "brand": STRESS_BRAND, "type": ProductType.NONE,
+            "size_ml": 100, "price": 50.0, "stock_quantity": stock, "description": "Stress test product",
+            "fragrance_family": "Amaderada", "is_active": True, "created_at": now, "updated_at": now,
+        }
+        for i in range(products)
+    ]
+    user_rows = [
+        {
+            "id": uuid4(), "email": f"stress-{i}-{uuid4().hex[:8]}@example.com",
+            "username": f"stress-{i}-{uuid4().hex[:8]}", "hashed_password": "!", "is_active": True,
+            "is_admin": False, "created_at": now, "updated_at": now,
+        }
+        for i in range(users)
+    ]
+    async with async_session_maker() as db:
+        await db.execute(insert(Product), product_rows)
+        await db.execute(insert(User), user_rows)
+        await db.commit()
+    return [row["id"] for row in product_rows], [row["id"] for row in user_rows]
+
+
+async def checkout(user_id, product_ids, quantity: int, gate: asyncio.Semaphore):
+    """One whole-cart reservation; returns (reserved, latency ms)"""
+    cart = list(product_ids)
+    random.shuffle(cart)
+    async with gate:
+        start = time.perf_counter()
+        async with async_session_maker() as db:
+            try:
+                await reservation_service.reserve(db, user_id, {pid: quantity for pid in cart})
+                await db.commit()
+                reserved = True
+            except OutOfStockError:
+                reserved = False
+        return reserved, (time.perf_counter() - start) * 1000
+
+
+async def stock_levels(product_ids):
+    async with async_session_maker() as db:
+        result = await db.execute(select(Product.id, Product.stock_quantity).where(Product.id.in_(product_ids)))
+        return dict(result.all())
+
+
+async def cleanup(product_ids, user_ids) -> None:
+    async with async_session_maker() as db:
+        await db.execute(delete(StockReservation).where(StockReservation.product_id.in_(product_ids)))
+        await db.execute(delete(Product).where(Product.id.in_(product_ids)))
+        await db.execute(delete(User).where(User.id.in_(user_ids)))
+        await db.commit()
+
+
+async def main(checkouts: int, concurrency: int, products: int, stock: int, quantity: int) -> int:
+    await init_db()
+    product_ids, user_ids = await seed(products, stock, checkouts)
+    failures = []
+    try:
+        gate = asyncio.Semaphore(concurrency)
+        start = time.perf_counter()
+        results = await asyncio.gather(*(checkout(uid, product_ids, quantity, gate) for uid in user_ids))
+        elapsed = time.perf_counter() - start
+
+        succeeded = sum(1 for reserved, _ in results if reserved)
+        expected = min(checkouts, stock // quantity)
+        levels = await stock_levels(product_ids)
+        if succeeded != expected:
+            failures.append(f"{succeeded} checkouts reserved stock, expected {expected}")
+        for product_id, level in levels.items():
+            if level != stock - succeeded * quantity:
+                failures.append(f"product {product_id} has {level} left, expected {stock - succeeded * quantity}")
+            if level < 0:
+                failures.append(f"product {product_id} went negative ({level})")
+
+        async with async_session_maker() as db:
+            released = await reservation_service.release_expired(db, datetime.utcnow() + timedelta(days=1))
+            while await reservation_service.release_expired(db, datetime.utcnow() + timedelta(days=1)):
+                pass
+        restored = await stock_levels(product_ids)
+        if any(level != stock for level in restored.values()):
+            failures.append(f"expiry did not restore stock: {sorted(restored.values())}")
+
+        timings = sorted(ms for _, ms in results)
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        print(
+            f"\n{checkouts} checkouts x {products} products, concurrency {concurrency}, stock {stock}\n"
+            f"reserved {succeeded} / rejected {checkouts - succeeded} in {elapsed:.2f}s "
+            f"({checkouts / elapsed:.0f}/s)\n"
+            f"latency p50 {statistics.median(timings):.1f} ms, p95 {p95:.1f} ms\n"
+            f"first sweep released {released} units"
+        )
+    finally:
+        await cleanup(product_ids, user_ids)
+
+    for failure in failures:
+        logger.error(failure)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--checkouts", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--products", type=int, default=3)
+    parser.add_argument("--stock", type=int, default=40)
+    parser.add_argument("--quantity", type=int, default=1)
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main(args.checkouts, args.concurrency, args.products, args.stock, args.quantity)))